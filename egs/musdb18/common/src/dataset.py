@@ -1,10 +1,15 @@
 import os
+import json
 import random
+import hashlib
+from concurrent.futures import ThreadPoolExecutor
 
+import numpy as np
+import soundfile as sf
 import torch
 import torchaudio
 
-from utils.audio import build_window
+from utils.audio import cached_window
 from transforms.stft import stft
 
 __sources__ = ['bass', 'drums', 'other', 'vocals']
@@ -12,6 +17,16 @@ __sources__ = ['bass', 'drums', 'other', 'vocals']
 SAMPLE_RATE_MUSDB18 = 44100
 EPS = 1e-12
 
+def build_patch_index(trackID, track_samples, patch_samples, overlap):
+    """
+    Enumerate patch start offsets of one track with a single np.arange instead of a per-patch Python loop.
+    Returns:
+        json_data <list<dict>>: Entries of {'trackID', 'start', 'samples'}.
+    """
+    starts = np.arange(0, track_samples - patch_samples, patch_samples - overlap, dtype=np.int64)
+
+    return [{'trackID': trackID, 'start': int(start), 'samples': patch_samples} for start in starts]
+
 class MUSDB18Dataset(torch.utils.data.Dataset):
     def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, sources=__sources__, target=None):
         """
@@ -41,18 +56,85 @@ class MUSDB18Dataset(torch.utils.data.Dataset):
         self.target = target
 
 class WaveDataset(MUSDB18Dataset):
-    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, sources=__sources__, target=None):
+    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, sources=__sources__, target=None, cache_dir=None):
         """
         Args:
             musdb18_root <int>: Path to MUSDB or MUSDB-HQ
             sample_rate: Sampling frequency. Default: 44100
             sources <list<str>>: Sources included in mixture
             target <str> or <list<str>>: Target source(s)
+            cache_dir <str>: If given, each stem is decoded once, stored as an int16 `.npy` file under `cache_dir`, and sliced via `np.memmap` afterwards instead of decoding WAV segments on every access.
         """
         super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target)
 
         self.json_data = None
 
+        self.cache_dir = cache_dir
+        self.memmaps = {} # Filled lazily (i.e. inside each worker) to avoid sharing memmap objects across forked processes.
+        self.sound_files = {} # Same as above, for persistent soundfile.SoundFile handles.
+
+    def _cache_path(self, trackID, source):
+        track = self.tracks[trackID]
+        filename = "{}_{}.npy".format(track['name'].replace(os.sep, '_'), source)
+
+        return os.path.join(self.cache_dir, filename)
+
+    def _get_memmap(self, trackID, source):
+        key = (trackID, source)
+
+        if key not in self.memmaps:
+            cache_path = self._cache_path(trackID, source)
+
+            if not os.path.exists(cache_path):
+                track = self.tracks[trackID]
+                waveform, _ = torchaudio.load(track['path'][source])
+                waveform = waveform.numpy()
+                waveform = np.clip(waveform * 32768, -32768, 32767).astype(np.int16)
+
+                os.makedirs(self.cache_dir, exist_ok=True)
+                np.save(cache_path, waveform)
+
+            self.memmaps[key] = np.load(cache_path, mmap_mode='r')
+
+        return self.memmaps[key]
+
+    def _get_sound_file(self, trackID, source):
+        key = (trackID, source)
+
+        if key not in self.sound_files:
+            track = self.tracks[trackID]
+            self.sound_files[key] = sf.SoundFile(track['path'][source])
+
+        return self.sound_files[key]
+
+    def _load_source(self, trackID, source, start=0, samples=-1):
+        """
+        Args:
+            trackID <int>: Index in `self.tracks`.
+            source <str>: 'mixture' or one of `self.sources`.
+            start <int>: Offset in samples.
+            samples <int>: Number of samples. If negative, the rest of the track is returned.
+        Returns:
+            waveform <torch.Tensor>: (n_mics, samples)
+        """
+        if self.cache_dir is None:
+            # MUSDB18(-HQ) stems are PCM16, so reading int16 halves the decoded bytes compared to a float32 decode.
+            sound_file = self._get_sound_file(trackID, source)
+            sound_file.seek(start)
+            waveform = sound_file.read(frames=samples, dtype='int16', always_2d=True)
+            waveform = torch.from_numpy(waveform.T.astype(np.float32) / 32768)
+        else:
+            memmap = self._get_memmap(trackID, source)
+
+            if samples < 0:
+                sliced = memmap[:, start:]
+            else:
+                sliced = memmap[:, start: start + samples]
+
+            waveform = torch.from_numpy(sliced.astype(np.float32) / 32768)
+
+        return waveform
+
     def __getitem__(self, idx):
         """
         Args:
@@ -67,29 +149,34 @@ class WaveDataset(MUSDB18Dataset):
         trackID = data['trackID']
         track = self.tracks[trackID]
         name = track['name']
-        paths = track['path']
         start = data['start']
         samples = data['samples']
 
         if set(self.sources) == set(__sources__):
-            mixture, _ = torchaudio.load(paths['mixture'], frame_offset=start, num_frames=samples)
+            mixture = self._load_source(trackID, 'mixture', start=start, samples=samples)
         else:
-            sources = []
+            # Accumulate in place; stacking a (len(sources), n_mics, T) tensor just to reduce it would double peak memory.
+            mixture = None
             for _source in self.sources:
-                source, _ = torchaudio.load(paths[_source], frame_offset=start, num_frames=samples)
-                sources.append(source.unsqueeze(dim=0))
-            sources = torch.cat(sources, dim=0)
-            mixture = sources.sum(dim=0)
+                source = self._load_source(trackID, _source, start=start, samples=samples)
+                if mixture is None:
+                    mixture = source
+                else:
+                    mixture += source
 
         if type(self.target) is list:
-            target = []
-            for _target in self.target:
-                source, _ = torchaudio.load(paths[_target], frame_offset=start, num_frames=samples)
-                target.append(source.unsqueeze(dim=0))
-            target = torch.cat(target, dim=0)
+            target = None
+            for target_idx, _target in enumerate(self.target):
+                source = self._load_source(trackID, _target, start=start, samples=samples)
+                if target is None:
+                    target = torch.empty(len(self.target), *source.size())
+                target[target_idx] = source
             mixture = mixture.unsqueeze(dim=0)
         else:
-            target, _ = torchaudio.load(paths[self.target], frame_offset=start, num_frames=samples)
+            target = self._load_source(trackID, self.target, start=start, samples=samples)
+
+        # Contiguous storage lets pin_memory and cudaMemcpyAsync take their fast path without a staging copy.
+        mixture, target = mixture.contiguous(), target.contiguous()
 
         return mixture, target, name
 
@@ -97,12 +184,12 @@ class WaveDataset(MUSDB18Dataset):
         return len(self.json_data)
 
 class WaveTrainDataset(WaveDataset):
-    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, samples=4*SAMPLE_RATE_MUSDB18, overlap=None, sources=__sources__, target=None, include_valid=False):
+    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, samples=4*SAMPLE_RATE_MUSDB18, overlap=None, sources=__sources__, target=None, include_valid=False, cache_dir=None):
         """
         Args:
             include_valid <bool>: Include validation data for training.
         """
-        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target)
+        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir)
 
         valid_txt_path = os.path.join(musdb18_root, 'validation.txt')
         train_txt_path = os.path.join(musdb18_root, 'train.txt')
@@ -146,15 +233,7 @@ class WaveTrainDataset(WaveDataset):
 
             self.tracks.append(track)
 
-            for start in range(0, track_samples, samples - overlap):
-                if start + samples >= track_samples:
-                    break
-                data = {
-                    'trackID': trackID,
-                    'start': start,
-                    'samples': samples,
-                }
-                self.json_data.append(data)
+            self.json_data.extend(build_patch_index(trackID, track_samples, samples, overlap))
 
     def __getitem__(self, idx):
         """
@@ -167,8 +246,8 @@ class WaveTrainDataset(WaveDataset):
         return mixture, target
 
 class WaveEvalDataset(WaveDataset):
-    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, max_samples=4*SAMPLE_RATE_MUSDB18, sources=__sources__, target=None):
-        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target)
+    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, max_samples=4*SAMPLE_RATE_MUSDB18, sources=__sources__, target=None, cache_dir=None):
+        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir)
 
         valid_txt_path = os.path.join(musdb18_root, 'validation.txt')
 
@@ -229,8 +308,8 @@ class WaveEvalDataset(WaveDataset):
         return mixture, target
 
 class WaveTestDataset(WaveDataset):
-    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, sources=__sources__, target=None):
-        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target)
+    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, sources=__sources__, target=None, cache_dir=None):
+        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir)
 
         test_txt_path = os.path.join(musdb18_root, 'test.txt')
 
@@ -271,8 +350,12 @@ class WaveTestDataset(WaveDataset):
             self.json_data.append(data)
 
 class SpectrogramDataset(WaveDataset):
-    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, sources=__sources__, target=None):
-        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target)
+    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, sources=__sources__, target=None, cache_dir=None, compute_stft=True):
+        """
+        Args:
+            compute_stft <bool>: If False, `__getitem__` returns raw waveforms and the STFT is left to the trainer, which can batch it on GPU (see `SpectrogramTrainerBase`).
+        """
+        super().__init__(musdb18_root, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir)
 
         if hop_length is None:
             hop_length = n_fft // 2
@@ -281,11 +364,12 @@ class SpectrogramDataset(WaveDataset):
         self.n_bins = n_fft // 2 + 1
 
         if window_fn:
-            self.window = build_window(n_fft, window_fn=window_fn)
+            self.window = cached_window(n_fft, window_fn=window_fn)
         else:
             self.window = None
 
         self.normalize = normalize
+        self.compute_stft = compute_stft
 
     def _is_active(self, input, threshold=1e-5):
         n_dims = input.dim()
@@ -294,7 +378,7 @@ class SpectrogramDataset(WaveDataset):
             input = input.reshape(-1, input.size(-1))
 
         input = torch.stft(input, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (len(sources)*n_mics, n_bins, n_frames)
-        power = torch.sum(torch.abs(input)**2, dim=-1) # (len(sources)*n_mics, n_bins, n_frames)
+        power = torch.view_as_real(input).pow(2).sum(dim=-1).sum(dim=-1) # (len(sources)*n_mics, n_bins), avoids the sqrt inside complex abs
         power = torch.mean(power)
 
         if power.item() >= threshold:
@@ -314,14 +398,19 @@ class SpectrogramDataset(WaveDataset):
 
         T = mixture.size(-1)
 
-        mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (1, n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
-        target = stft(target, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (len(sources), n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
+        if self.compute_stft:
+            mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (1, n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
+            target = stft(target, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (len(sources), n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
 
         return mixture, target, T, name
 
 class SpectrogramTrainDataset(SpectrogramDataset):
-    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, samples=4*SAMPLE_RATE_MUSDB18, overlap=None, sources=__sources__, target=None, include_valid=False):
-        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target)
+    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, samples=4*SAMPLE_RATE_MUSDB18, overlap=None, sources=__sources__, target=None, include_valid=False, cache_dir=None, compute_stft=True, threshold=None):
+        """
+        Args:
+            threshold <float>: If given, patches whose mean power is below `threshold` are dropped from `json_data` by a one-off scan of each track (see `_build_active_index`), instead of rejecting silent patches with an STFT at sampling time.
+        """
+        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir, compute_stft=compute_stft)
 
         assert_sample_rate(sample_rate)
 
@@ -348,10 +437,27 @@ class SpectrogramTrainDataset(SpectrogramDataset):
         self.tracks = []
         self.json_data = []
 
-        for trackID, name in enumerate(names):
-            mixture_path = os.path.join(musdb18_root, 'train', name, "mixture.wav")
-            audio_info = torchaudio.info(mixture_path)
-            track_sample_rate = audio_info.sample_rate
+        cache_path = None
+
+        if cache_dir is not None:
+            key = hashlib.md5("{}_{}_{}_{}".format("-".join(names), samples, overlap, threshold).encode()).hexdigest()
+            cache_path = os.path.join(cache_dir, "spectrogram_train_{}.json".format(key))
+
+            if os.path.exists(cache_path):
+                with open(cache_path, 'r') as f:
+                    cache = json.load(f)
+
+                self.tracks, self.json_data = cache['tracks'], cache['json_data']
+
+                return
+
+        mixture_paths = [os.path.join(musdb18_root, 'train', name, "mixture.wav") for name in names]
+
+        # The metadata sweep is I/O bound, so read headers in parallel.
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            audio_infos = list(executor.map(torchaudio.info, mixture_paths))
+
+        for trackID, (name, mixture_path, audio_info) in enumerate(zip(names, mixture_paths, audio_infos)):
             track_samples = audio_info.num_frames
 
             track = {
@@ -367,20 +473,64 @@ class SpectrogramTrainDataset(SpectrogramDataset):
 
             self.tracks.append(track)
 
-            for start in range(0, track_samples, samples - overlap):
-                if start + samples >= track_samples:
-                    break
+            for start in self._build_active_index(trackID, samples, overlap, threshold):
                 data = {
                     'trackID': trackID,
-                    'start': start,
+                    'start': int(start),
                     'samples': samples,
                 }
                 self.json_data.append(data)
 
+        if cache_path is not None:
+            os.makedirs(cache_dir, exist_ok=True)
+
+            with open(cache_path, 'w') as f:
+                json.dump({'tracks': self.tracks, 'json_data': self.json_data}, f)
+
+    def _build_active_index(self, trackID, patch_samples, overlap, threshold):
+        """
+        Enumerate patch start offsets of one track, dropping silent patches when `threshold` is given.
+        The track is decoded once and per-patch power is computed from a cumulative sum, which replaces an STFT per candidate patch with an O(1) lookup at sampling time.
+        Args:
+            trackID <int>: Index in `self.tracks`.
+            patch_samples <int>: Number of samples per patch.
+            overlap <int>: Overlap of adjacent patches in samples.
+            threshold <float>: Minimum mean power of an active patch. If None, all patches are kept.
+        Returns:
+            starts <np.ndarray>: Start offsets of active patches.
+        """
+        track = self.tracks[trackID]
+        track_samples = track['samples']
+
+        starts = np.arange(0, track_samples, patch_samples - overlap, dtype=np.int64)
+        starts = starts[starts + patch_samples < track_samples]
+
+        if threshold is None:
+            return starts
+
+        if self.cache_dir is not None:
+            cache_path = os.path.join(self.cache_dir, "active_{}_{}_{}_{}.npy".format(track['name'].replace(os.sep, '_'), patch_samples, overlap, threshold))
+
+            if os.path.exists(cache_path):
+                return np.load(cache_path)
+
+        mixture, _ = torchaudio.load(track['path']['mixture'])
+        mixture = mixture.mean(dim=0).numpy().astype(np.float64)
+
+        cum_power = np.concatenate([[0], np.cumsum(mixture**2)])
+        power = (cum_power[starts + patch_samples] - cum_power[starts]) / patch_samples
+        starts = starts[power >= threshold]
+
+        if self.cache_dir is not None:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            np.save(cache_path, starts)
+
+        return starts
+
     def __getitem__(self, idx):
         """
         Returns:
-            mixture <torch.Tensor>: Complex tensor with shape (1, n_mics, n_bins, n_frames)  if `target` is list, otherwise (n_mics, n_bins, n_frames) 
+            mixture <torch.Tensor>: Complex tensor with shape (1, n_mics, n_bins, n_frames)  if `target` is list, otherwise (n_mics, n_bins, n_frames)
             target <torch.Tensor>: Complex tensor with shape (len(target), n_mics, n_bins, n_frames) if `target` is list, otherwise (n_mics, n_bins, n_frames)
         """
         mixture, target, _, _ = super().__getitem__(idx)
@@ -388,8 +538,8 @@ class SpectrogramTrainDataset(SpectrogramDataset):
         return mixture, target
 
 class SpectrogramEvalDataset(SpectrogramDataset):
-    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, max_samples=10*SAMPLE_RATE_MUSDB18, sources=__sources__, target=None):
-        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target)
+    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, max_samples=10*SAMPLE_RATE_MUSDB18, sources=__sources__, target=None, cache_dir=None, compute_stft=True):
+        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir, compute_stft=compute_stft)
 
         valid_txt_path = os.path.join(musdb18_root, 'validation.txt')
 
@@ -449,8 +599,8 @@ class SpectrogramEvalDataset(SpectrogramDataset):
         return mixture, sources, T, name
 
 class SpectrogramTestDataset(SpectrogramDataset):
-    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, max_samples=10*SAMPLE_RATE_MUSDB18, sources=__sources__, target=None):
-        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target)
+    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, max_samples=10*SAMPLE_RATE_MUSDB18, sources=__sources__, target=None, cache_dir=None, compute_stft=True):
+        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir, compute_stft=compute_stft)
 
         test_txt_path = os.path.join(musdb18_root, 'test.txt')
 
@@ -516,19 +666,21 @@ class SpectrogramTestDataset(SpectrogramDataset):
     Augmentation dataset
 """
 class AugmentationWaveTrainDataset(WaveDataset):
-    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, duration=4, overlap=None, samples_per_epoch=None, sources=__sources__, target=None, include_valid=False, augmentation=None):
+    def __init__(self, musdb18_root, sample_rate=SAMPLE_RATE_MUSDB18, duration=4, overlap=None, samples_per_epoch=None, sources=__sources__, target=None, include_valid=False, augmentation=None, cache_dir=None):
         """
         Args:
             musdb18_root <int>: Path to MUSDB or MUSDB-HQ
             sample_rate: Sampling frequency. Default: 44100
             sources <list<str>>: Sources included in mixture
             target <str> or <list<str>>: Target source(s)
+            cache_dir <str>: If given, each stem is decoded once, stored as an int16 `.npy` file under `cache_dir`, and sliced via `np.memmap` afterwards instead of decoding WAV segments on every access.
         """
         super().__init__(
             musdb18_root,
             sample_rate=SAMPLE_RATE_MUSDB18, # WaveDataset's sample_rate is expected SAMPLE_RATE_MUSDB18
             sources=sources,
-            target=target
+            target=target,
+            cache_dir=cache_dir
         )
 
         valid_txt_path = os.path.join(musdb18_root, 'validation.txt')
@@ -661,11 +813,10 @@ class AugmentationWaveTrainDataset(WaveDataset):
 
         for _source, trackID in zip(self.sources, track_indices):
             track = self.tracks[trackID]
-            source_path = track['path'][_source]
             track_samples = track['samples_original']
 
             start = random.randint(0, track_samples - self.samples - 1)
-            source, _ = torchaudio.load(source_path, frame_offset=start, num_frames=self.samples)
+            source = self._load_source(trackID, _source, start=start, samples=self.samples)
 
             # Apply augmentation
             source = self.augmentation(source)
@@ -698,8 +849,13 @@ class AugmentationSpectrogramTrainDataset(SpectrogramDataset):
     """
     Training dataset that returns randomly selected mixture spectrograms.
     """
-    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, patch_samples=6*SAMPLE_RATE_MUSDB18, overlap=None, samples_per_epoch=None, sources=__sources__, target=None, include_valid=False, augmentation=None):
-        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target)
+    def __init__(self, musdb18_root, n_fft, hop_length=None, window_fn='hann', normalize=False, sample_rate=SAMPLE_RATE_MUSDB18, patch_samples=6*SAMPLE_RATE_MUSDB18, overlap=None, samples_per_epoch=None, sources=__sources__, target=None, include_valid=False, augmentation=None, cache_dir=None, compute_stft=True):
+        """
+        Args:
+            cache_dir <str>: If given, each stem is decoded once, stored as an int16 `.npy` file under `cache_dir`, and sliced via `np.memmap` afterwards instead of decoding WAV segments on every access.
+            compute_stft <bool>: If False, `__getitem__` returns raw waveforms and the STFT is left to the trainer, which can batch it on GPU (see `SpectrogramTrainerBase`).
+        """
+        super().__init__(musdb18_root, n_fft=n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, sample_rate=sample_rate, sources=sources, target=target, cache_dir=cache_dir, compute_stft=compute_stft)
 
         valid_txt_path = os.path.join(musdb18_root, 'validation.txt')
         train_txt_path = os.path.join(musdb18_root, 'train.txt')
@@ -780,15 +936,7 @@ class AugmentationSpectrogramTrainDataset(SpectrogramDataset):
 
                 self.tracks.append(track)
 
-                for start in range(0, track_samples, patch_samples - overlap):
-                    if start + patch_samples >= track_samples:
-                        break
-                    data = {
-                        'trackID': trackID,
-                        'start': start,
-                        'samples': patch_samples,
-                    }
-                    self.json_data.append(data)
+                self.json_data.extend(build_patch_index(trackID, track_samples, patch_samples, overlap))
 
     def __getitem__(self, idx):
         """
@@ -801,8 +949,9 @@ class AugmentationSpectrogramTrainDataset(SpectrogramDataset):
         else:
             mixture, target = self._getitem(idx)
 
-        mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (1, n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
-        target = stft(target, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (len(sources), n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
+        if self.compute_stft:
+            mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (1, n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
+            target = stft(target, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (len(sources), n_mics, n_bins, n_frames) or (n_mics, n_bins, n_frames)
 
         return mixture, target
 
@@ -842,11 +991,10 @@ class AugmentationSpectrogramTrainDataset(SpectrogramDataset):
 
         for _source, trackID in zip(self.sources, track_indices):
             track = self.tracks[trackID]
-            source_path = track['path'][_source]
             track_samples = track['samples']
 
             start = random.randint(0, track_samples - self.patch_samples - 1)
-            source, _ = torchaudio.load(source_path, frame_offset=start, num_frames=self.patch_samples)
+            source = self._load_source(trackID, _source, start=start, samples=self.patch_samples)
 
             # Apply augmentation
             source = self.augmentation(source)
@@ -872,22 +1020,79 @@ class AugmentationSpectrogramTrainDataset(SpectrogramDataset):
 
         return mixture, target
 
+"""
+    Sampler
+"""
+class TrackShuffleSampler(torch.utils.data.Sampler):
+    """
+    Shuffle at track granularity.
+    Patch indices belonging to the same track stay contiguous, so a DataLoader worker keeps hitting its open file handles (see `WaveDataset._get_sound_file`) and memmaps instead of hopping between WAVs on every sample.
+    """
+    def __init__(self, dataset, shuffle_in_track=True):
+        self.dataset = dataset
+        self.shuffle_in_track = shuffle_in_track
+
+    def __iter__(self):
+        indices_by_track = {}
+
+        for idx, data in enumerate(self.dataset.json_data):
+            indices_by_track.setdefault(data['trackID'], []).append(idx)
+
+        track_ids = list(indices_by_track.keys())
+        random.shuffle(track_ids)
+
+        for trackID in track_ids:
+            indices = indices_by_track[trackID]
+
+            if self.shuffle_in_track:
+                random.shuffle(indices)
+
+            yield from indices
+
+    def __len__(self):
+        return len(self.dataset)
+
 """
     Data loader
 """
+def _set_default_loader_kwargs(kwargs):
+    """
+    Fill in performance-related DataLoader defaults without overriding explicit choices.
+    Persistent workers skip the per-epoch fork and dataset warm-up, prefetching keeps the queue full, and pinned memory enables async H2D copies in the trainers.
+    """
+    kwargs.setdefault('pin_memory', True)
+
+    if kwargs.get('num_workers', 0) > 0:
+        kwargs.setdefault('persistent_workers', True)
+        kwargs.setdefault('prefetch_factor', 4)
+
+    return kwargs
+
 class TrainDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
+        kwargs = _set_default_loader_kwargs(kwargs)
+
+        dataset = args[0] if args else kwargs.get('dataset')
+
+        if kwargs.get('shuffle') and kwargs.get('sampler') is None and getattr(dataset, 'json_data', None):
+            # Shuffle at track granularity, so each worker keeps hitting its
+            # open handles and memmaps instead of hopping between WAVs.
+            # Datasets without a patch index (random-draw augmentation mode)
+            # keep the plain per-sample shuffle.
+            kwargs['shuffle'] = False
+            kwargs['sampler'] = TrackShuffleSampler(dataset)
+
         super().__init__(*args, **kwargs)
 
 class EvalDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__(*args, **_set_default_loader_kwargs(kwargs))
 
         assert self.batch_size == 1, "batch_size is expected 1, but given {}".format(self.batch_size)
 
 class TestDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__(*args, **_set_default_loader_kwargs(kwargs))
 
         assert self.batch_size == 1, "batch_size is expected 1, but given {}".format(self.batch_size)
 
@@ -1,5 +1,6 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import musdb
 import museval
@@ -8,6 +9,7 @@ import torchaudio
 import torch.nn as nn
 
 from utils.utils import draw_loss_curve
+from transforms.stft import stft, istft
 from algorithm.frequency_mask import multichannel_wiener_filter
 
 BITS_PER_SAMPLE_MUSDB18 = 16
@@ -39,18 +41,41 @@ class TrainerBase:
 
         self.epochs = args.epochs
 
-        self.train_loss = torch.empty(self.epochs)
-        self.valid_loss = torch.empty(self.epochs)
+        # zeros, not empty: the tail of these buffers is saved in checkpoints and sliced on resume.
+        self.train_loss = torch.zeros(self.epochs, dtype=torch.float32)
+        self.valid_loss = torch.zeros(self.epochs, dtype=torch.float32)
+
+        # Sample WAVs are written off the training thread (see run_one_epoch_eval).
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Export validation samples every `sample_log_every` epochs only.
+        if hasattr(args, 'sample_log_every'):
+            self.sample_log_every = args.sample_log_every
+        else:
+            self.sample_log_every = 10
+
+        # Mixed-precision training (args.use_amp)
+        if hasattr(args, 'use_amp'):
+            self.use_amp = args.use_amp and args.use_cuda
+        else:
+            self.use_amp = False
+
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
 
         self.use_cuda = args.use_cuda
 
         if args.continue_from:
-            config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
+            try:
+                # mmap shares the checkpoint pages with the file instead of copying them through pickle (PyTorch >= 2.1).
+                config = torch.load(args.continue_from, map_location='cpu', mmap=True)
+            except (TypeError, RuntimeError):
+                # Older PyTorch or a legacy (non-zipfile) checkpoint.
+                config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
 
             self.start_epoch = config['epoch']
 
-            self.train_loss[:self.start_epoch] = config['train_loss'][:self.start_epoch]
-            self.valid_loss[:self.start_epoch] = config['valid_loss'][:self.start_epoch]
+            self.train_loss[:self.start_epoch].copy_(config['train_loss'][:self.start_epoch])
+            self.valid_loss[:self.start_epoch].copy_(config['valid_loss'][:self.start_epoch])
 
             self.best_loss = config['best_loss']
             self.prev_loss = self.valid_loss[self.start_epoch-1]
@@ -142,19 +167,27 @@ class TrainerBase:
 
         for idx, (mixture, sources) in enumerate(self.train_loader):
             if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
+
+            with torch.autocast('cuda', enabled=self.use_amp):
+                estimated_sources = self.model(mixture)
+
+            if self.use_amp:
+                estimated_sources = estimated_sources.float() # Keep the loss in fp32.
 
-            estimated_sources = self.model(mixture)
             loss = self.criterion(estimated_sources, sources)
 
             self.optimizer.zero_grad()
-            loss.backward()
+            self.scaler.scale(loss).backward()
 
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
 
-            self.optimizer.step()
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
 
             train_loss += loss.item()
 
@@ -171,32 +204,39 @@ class TrainerBase:
         """
         self.model.eval()
 
-        valid_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
 
+        futures = []
+
         with torch.no_grad():
             for idx, (mixture, sources, titles) in enumerate(self.valid_loader):
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
                 estimated_sources = self.model(mixture)
                 loss = self.criterion(estimated_sources, sources, batch_mean=False)
                 loss = loss.sum(dim=0)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
+
+                if idx < 5 and epoch % self.sample_log_every == 0:
+                    mixture = mixture[0].squeeze(dim=0).detach()
+                    estimated_sources = estimated_sources[0].detach()
+
+                    if self.save_normalized:
+                        # Normalize on device before the D2H copy. `amax` is a single fused reduction.
+                        mixture = mixture / torch.abs(mixture).amax().clamp_min(EPS)
+                        norm = torch.abs(estimated_sources).amax(dim=(-2, -1), keepdim=True).clamp_min(EPS)
+                        estimated_sources = estimated_sources / norm
 
-                if idx < 5:
-                    mixture = mixture[0].squeeze(dim=0).detach().cpu()
-                    estimated_sources = estimated_sources[0].detach().cpu()
+                    mixture, estimated_sources = mixture.cpu(), estimated_sources.cpu()
 
                     save_dir = os.path.join(self.sample_dir, titles[0])
                     os.makedirs(save_dir, exist_ok=True)
                     save_path = os.path.join(save_dir, "mixture.wav")
 
-                    if self.save_normalized:
-                        norm = torch.abs(mixture).max()
-                        mixture = mixture / norm
-
-                    torchaudio.save(save_path, mixture, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, mixture, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
 
                     save_dir = os.path.join(self.sample_dir, titles[0], "epoch{}".format(epoch + 1))
                     os.makedirs(save_dir, exist_ok=True)
@@ -205,13 +245,12 @@ class TrainerBase:
                         target = self.valid_loader.dataset.target[source_idx]
                         save_path = os.path.join(save_dir, "{}.wav".format(target))
 
-                        if self.save_normalized:
-                            norm = torch.abs(estimated_source).max()
-                            estimated_source = estimated_source / norm
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, estimated_source, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
 
-                        torchaudio.save(save_path, estimated_source, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+        for future in futures:
+            future.result()
 
-        valid_loss /= n_valid
+        valid_loss = valid_loss.item() / n_valid
 
         return valid_loss
 
@@ -235,6 +274,152 @@ class TrainerBase:
 
         torch.save(config, model_path)
 
+class SpectrogramTrainerBase(TrainerBase):
+    """
+    Trainer which computes the STFT of a whole batch on the device.
+    Expects datasets built with `compute_stft=False`, i.e. batches of raw waveforms.
+    One batched `torch.stft` on GPU replaces the per-sample CPU STFT in the DataLoader workers.
+    """
+    def _reset(self, args):
+        super()._reset(args)
+
+        dataset = self.valid_loader.dataset
+
+        self.n_fft, self.hop_length = dataset.n_fft, dataset.hop_length
+        self.normalize = dataset.normalize
+
+        window = dataset.window
+
+        if self.use_cuda and window is not None:
+            window = window.cuda()
+
+        self.window = window
+
+    def stft(self, input):
+        """
+        Args:
+            input <torch.Tensor>: (*, T)
+        Returns:
+            output <torch.Tensor>: Complex tensor with shape of (*, n_bins, n_frames)
+        """
+        return stft(input, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True)
+
+    def istft(self, input, length=None):
+        """
+        Args:
+            input <torch.Tensor>: Complex tensor with shape of (*, n_bins, n_frames)
+        Returns:
+            output <torch.Tensor>: (*, length)
+        """
+        return istft(input, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, length=length, return_complex=False)
+
+    def run_one_epoch_train(self, epoch):
+        """
+        Training
+        """
+        self.model.train()
+
+        train_loss = 0
+        n_train_batch = len(self.train_loader)
+
+        for idx, (mixture, sources) in enumerate(self.train_loader):
+            if self.use_cuda:
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
+
+            mixture = self.stft(mixture)
+            sources = self.stft(sources)
+
+            with torch.autocast('cuda', enabled=self.use_amp):
+                estimated_sources = self.model(mixture)
+
+            if self.use_amp:
+                estimated_sources = estimated_sources.float() # Keep the loss in fp32.
+
+            loss = self.criterion(estimated_sources, sources)
+
+            self.optimizer.zero_grad()
+            self.scaler.scale(loss).backward()
+
+            if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
+                nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
+
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
+
+            train_loss += loss.item()
+
+            if (idx + 1) % 100 == 0:
+                print("[Epoch {}/{}] iter {}/{} loss: {:.5f}".format(epoch + 1, self.epochs, idx + 1, n_train_batch, loss.item()), flush=True)
+
+        train_loss /= n_train_batch
+
+        return train_loss
+
+    def run_one_epoch_eval(self, epoch):
+        """
+        Validation
+        """
+        self.model.eval()
+
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
+        n_valid = len(self.valid_loader.dataset)
+
+        futures = []
+
+        with torch.no_grad():
+            for idx, (mixture, sources, T, titles) in enumerate(self.valid_loader):
+                if self.use_cuda:
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
+
+                mixture = self.stft(mixture)
+                sources = self.stft(sources)
+
+                estimated_sources = self.model(mixture)
+                loss = self.criterion(estimated_sources, sources, batch_mean=False)
+                loss = loss.sum(dim=0)
+                valid_loss += loss.detach()
+
+                if idx < 5 and epoch % self.sample_log_every == 0:
+                    T_segment = T[0].item() if torch.is_tensor(T) else T[0]
+
+                    mixture = self.istft(mixture[0].squeeze(dim=0), length=T_segment).detach() # (n_mics, T_segment)
+                    estimated_sources = self.istft(estimated_sources[0], length=T_segment).detach() # (len(target), n_mics, T_segment)
+
+                    if self.save_normalized:
+                        # Normalize on device before the D2H copy. `amax` is a single fused reduction.
+                        mixture = mixture / torch.abs(mixture).amax().clamp_min(EPS)
+                        norm = torch.abs(estimated_sources).amax(dim=(-2, -1), keepdim=True).clamp_min(EPS)
+                        estimated_sources = estimated_sources / norm
+
+                    mixture, estimated_sources = mixture.cpu(), estimated_sources.cpu()
+
+                    save_dir = os.path.join(self.sample_dir, titles[0])
+                    os.makedirs(save_dir, exist_ok=True)
+                    save_path = os.path.join(save_dir, "mixture.wav")
+
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, mixture, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
+
+                    save_dir = os.path.join(self.sample_dir, titles[0], "epoch{}".format(epoch + 1))
+                    os.makedirs(save_dir, exist_ok=True)
+
+                    for source_idx, estimated_source in enumerate(estimated_sources):
+                        target = self.valid_loader.dataset.target[source_idx]
+                        save_path = os.path.join(save_dir, "{}.wav".format(target))
+
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, estimated_source, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
+
+        for future in futures:
+            future.result()
+
+        valid_loss = valid_loss.item() / n_valid
+
+        return valid_loss
+
 class TesterBase:
     def __init__(self, model, loader, criterion, args):
         self.loader = loader
@@ -19,6 +19,7 @@ from criterion.sdr import NegSDR, NegSISDR
 parser = argparse.ArgumentParser(description="Training of Conv-TasNet")
 
 parser.add_argument('--musdb18_root', type=str, default=None, help='Path to MUSDB18')
+parser.add_argument('--cache_dir', type=str, default=None, help='Cache decoded stems as int16 .npy files under this directory')
 parser.add_argument('--sample_rate', type=int, default=44100, help='Sampling rate')
 parser.add_argument('--duration', type=float, default=2, help='Duration')
 parser.add_argument('--valid_duration', type=float, default=4, help='Duration for valid dataset for avoiding memory error.')
@@ -78,7 +79,7 @@ def main(args):
     for name in config_augmentation['augmentation']:
         augmentation.append(choose_augmentation(name, **config_augmentation[name]))
 
-    train_dataset = AugmentationWaveTrainDataset(args.musdb18_root, sample_rate=args.sample_rate, duration=args.duration, samples_per_epoch=args.samples_per_epoch, sources=args.sources, target=args.sources, augmentation=augmentation)
+    train_dataset = AugmentationWaveTrainDataset(args.musdb18_root, sample_rate=args.sample_rate, duration=args.duration, samples_per_epoch=args.samples_per_epoch, sources=args.sources, target=args.sources, augmentation=augmentation, cache_dir=args.cache_dir)
     valid_dataset = WaveEvalDataset(args.musdb18_root, sample_rate=args.sample_rate, max_duration=args.valid_duration, sources=args.sources)
     print("Training dataset includes {} samples.".format(len(train_dataset)))
     print("Valid dataset includes {} samples.".format(len(valid_dataset)))
@@ -19,6 +19,7 @@ from criterion.sdr import NegSDR, NegSISDR
 parser = argparse.ArgumentParser(description="Training of Conv-TasNet")
 
 parser.add_argument('--musdb18_root', type=str, default=None, help='Path to MUSDB18')
+parser.add_argument('--cache_dir', type=str, default=None, help='Cache decoded stems as int16 .npy files under this directory')
 parser.add_argument('--sample_rate', '-sr', type=int, default=44100, help='Sampling rate')
 parser.add_argument('--duration', type=float, default=2, help='Duration')
 parser.add_argument('--valid_duration', type=float, default=4, help='Duration for valid dataset for avoiding memory error.')
@@ -58,6 +59,8 @@ parser.add_argument('--loss_dir', type=str, default='./tmp/loss', help='Loss dir
 parser.add_argument('--sample_dir', type=str, default='./tmp/sample', help='Sample directory')
 parser.add_argument('--continue_from', type=str, default=None, help='Resume training')
 parser.add_argument('--use_cuda', type=int, default=1, help='0: Not use cuda, 1: Use cuda')
+parser.add_argument('--use_amp', type=int, default=0, help='0: Not use automatic mixed precision, 1: Use automatic mixed precision')
+parser.add_argument('--sample_log_every', type=int, default=10, help='Export validation samples every sample_log_every epochs')
 parser.add_argument('--overwrite', type=int, default=0, help='0: NOT overwrite, 1: FORCE overwrite')
 parser.add_argument('--num_workers', type=int, default=0, help='# of workers given to data loader for training.')
 parser.add_argument('--seed', type=int, default=42, help='Random seed')
@@ -83,7 +86,8 @@ def main(args):
         sample_rate=args.sample_rate, duration=args.duration, samples_per_epoch=args.samples_per_epoch,
         sources=args.sources, target=args.sources,
         include_valid=True,
-        augmentation=augmentation
+        augmentation=augmentation,
+        cache_dir=args.cache_dir
     )
     valid_dataset = WaveEvalDataset(args.musdb18_root, sample_rate=args.sample_rate, max_duration=args.valid_duration, sources=args.sources)
     print("Training dataset includes {} samples.".format(len(train_dataset)))
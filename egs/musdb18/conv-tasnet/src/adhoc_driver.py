@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import musdb
 import museval
@@ -27,21 +28,29 @@ class AdhocTrainer(TrainerBase):
 
         for idx, (mixture, sources) in enumerate(self.train_loader):
             if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
             mean, std = mixture.mean(dim=-1, keepdim=True), mixture.std(dim=-1, keepdim=True)
             standardized_mixture = (mixture - mean) / (std + EPS)
             standardized_sources = (sources - mean) / (std + EPS)
-            standardized_estimated_sources = self.model(standardized_mixture)
+            with torch.autocast('cuda', enabled=self.use_amp):
+                standardized_estimated_sources = self.model(standardized_mixture)
+
+            if self.use_amp:
+                standardized_estimated_sources = standardized_estimated_sources.float() # Keep the loss in fp32.
+
             loss = self.criterion(standardized_estimated_sources, standardized_sources)
 
             self.optimizer.zero_grad()
-            loss.backward()
+            self.scaler.scale(loss).backward()
 
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
 
-            self.optimizer.step()
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
 
             train_loss += loss.item()
 
@@ -58,37 +67,44 @@ class AdhocTrainer(TrainerBase):
         """
         self.model.eval()
 
-        valid_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
 
+        futures = []
+
         with torch.no_grad():
             for idx, (mixture, sources, titles) in enumerate(self.valid_loader):
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
                 mean, std = mixture.mean(dim=-1, keepdim=True), mixture.std(dim=-1, keepdim=True)
                 standardized_mixture = (mixture - mean) / (std + EPS)
                 standardized_sources = (sources - mean) / (std + EPS)
                 standardized_estimated_sources = self.model(standardized_mixture)
                 loss = self.criterion(standardized_estimated_sources, standardized_sources, batch_mean=False)
                 loss = loss.sum(dim=0)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
 
-                if idx < 5:
+                if idx < 5 and epoch % self.sample_log_every == 0:
                     estimated_sources = std * standardized_estimated_sources + mean
 
-                    mixture = mixture[0].squeeze(dim=0).detach().cpu()
-                    estimated_sources = estimated_sources[0].detach().cpu()
+                    mixture = mixture[0].squeeze(dim=0).detach()
+                    estimated_sources = estimated_sources[0].detach()
+
+                    if self.save_normalized:
+                        # Normalize on device before the D2H copy. `amax` is a single fused reduction.
+                        mixture = mixture / torch.abs(mixture).amax().clamp_min(EPS)
+                        norm = torch.abs(estimated_sources).amax(dim=(-2, -1), keepdim=True).clamp_min(EPS)
+                        estimated_sources = estimated_sources / norm
+
+                    mixture, estimated_sources = mixture.cpu(), estimated_sources.cpu()
 
                     save_dir = os.path.join(self.sample_dir, titles[0])
                     os.makedirs(save_dir, exist_ok=True)
                     save_path = os.path.join(save_dir, "mixture.wav")
 
-                    if self.save_normalized:
-                        norm = torch.abs(mixture).max()
-                        mixture = mixture / norm
-
-                    torchaudio.save(save_path, mixture, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, mixture, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
 
                     save_dir = os.path.join(self.sample_dir, titles[0], "epoch{}".format(epoch + 1))
                     os.makedirs(save_dir, exist_ok=True)
@@ -96,13 +112,12 @@ class AdhocTrainer(TrainerBase):
                         target = self.valid_loader.dataset.target[source_idx]
                         save_path = os.path.join(save_dir, "{}.wav".format(target))
 
-                        if self.save_normalized:
-                            norm = torch.abs(estimated_source).max()
-                            estimated_source = estimated_source / norm
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, estimated_source, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
 
-                        torchaudio.save(save_path, estimated_source, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+        for future in futures:
+            future.result()
 
-        valid_loss /= n_valid
+        valid_loss = valid_loss.item() / n_valid
 
         return valid_loss
 
@@ -152,6 +167,23 @@ class FinetuneTrainer(AdhocTrainer):
 
         self.use_cuda = args.use_cuda
 
+        # Sample WAVs are written off the training thread (see run_one_epoch_eval).
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Export validation samples every `sample_log_every` epochs only.
+        if hasattr(args, 'sample_log_every'):
+            self.sample_log_every = args.sample_log_every
+        else:
+            self.sample_log_every = 10
+
+        # Mixed-precision training (args.use_amp)
+        if hasattr(args, 'use_amp'):
+            self.use_amp = args.use_amp and args.use_cuda
+        else:
+            self.use_amp = False
+
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
+
         # Continue from
         config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
 
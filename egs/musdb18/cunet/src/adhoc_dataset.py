@@ -93,7 +93,7 @@ class SpectrogramDataset(WaveDataset):
             input = input.reshape(-1, input.size(-1))
 
         input = torch.stft(input, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (len(sources)*2, n_bins, n_frames)
-        power = torch.sum(torch.abs(input)**2, dim=-1) # (len(sources)*2, n_bins, n_frames)
+        power = torch.view_as_real(input).pow(2).sum(dim=-1).sum(dim=-1) # (len(sources)*2, n_bins), avoids the sqrt inside complex abs
         power = torch.mean(power)
 
         if power.item() >= threshold:
@@ -228,24 +228,26 @@ class SpectrogramEvalDataset(SpectrogramDataset):
         paths = track['path']
         start, samples = data['start'], data['samples']
 
-        sources = []
-        target = []
-        latent = torch.zeros((len(self.sources), len(self.sources)))
-        scales = []
         source_names = self.sources.copy()
 
+        scales = torch.empty(len(self.sources)).uniform_(0.5, 1) # 1 doesn't work.
+        latent = torch.diag(scales)
+
+        sources = None
+
         for source_idx, source_name in enumerate(self.sources):
             path = paths[source_name]
             source, _ = torchaudio.load(path, frame_offset=start, num_frames=samples)
-            sources.append(source)
-            scale = random.uniform(0.5, 1) # 1 doesn't work.
-            latent[source_idx, source_idx] = scale
-            target.append(scale * source)
-            scales.append(scale)
-        
-        sources = torch.concatenate(sources, dim=0)
-        target = torch.concatenate(target, dim=0)
+
+            if sources is None:
+                n_mics = source.size(0)
+                sources = torch.empty(len(self.sources) * n_mics, source.size(-1)) # Preallocated; filled in place instead of list + concatenate.
+
+            sources[source_idx * n_mics: (source_idx + 1) * n_mics] = source
+
+        target = scales.repeat_interleave(n_mics).unsqueeze(dim=-1) * sources
         mixture = sources.sum(dim=0, keepdim=True)
+        scales = scales.tolist()
 
         mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (1, 2, n_bins, n_frames) or (2, n_bins, n_frames)
         target = stft(target, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (len(sources), 2, n_bins, n_frames) or (2, n_bins, n_frames)
@@ -1,5 +1,6 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 import torchaudio
@@ -50,6 +51,23 @@ class AdhocTrainer(TrainerBase):
         self.resampler = torchaudio.transforms.Resample(self.sample_rate, SAMPLE_RATE_MUSDB18)
 
         self.use_cuda = args.use_cuda
+
+        # Sample WAVs are written off the training thread (see run_one_epoch_eval).
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Export validation samples every `sample_log_every` epochs only.
+        if hasattr(args, 'sample_log_every'):
+            self.sample_log_every = args.sample_log_every
+        else:
+            self.sample_log_every = 10
+
+        # Mixed-precision training (args.use_amp)
+        if hasattr(args, 'use_amp'):
+            self.use_amp = args.use_amp and args.use_cuda
+        else:
+            self.use_amp = False
+
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
         
         if args.continue_from:
             package = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
@@ -129,28 +147,35 @@ class AdhocTrainer(TrainerBase):
         
         for idx, (mixture, target, latent) in enumerate(self.train_loader):
             if self.use_cuda:
-                mixture = mixture.cuda()
-                target = target.cuda()
-                latent = latent.cuda()
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                target = target.cuda(non_blocking=True)
+                latent = latent.cuda(non_blocking=True)
             
             mixture_amplitude = torch.abs(mixture)
             target_amplitude = torch.abs(target)
 
-            if self.model.masking:
-                estimated_target_amplitude = self.model(mixture_amplitude, latent)
-            else:
-                estimated_mask = self.model(mixture_amplitude, latent)
-                estimated_target_amplitude = estimated_mask * mixture_amplitude
-            
+            with torch.autocast('cuda', enabled=self.use_amp):
+                if self.model.masking:
+                    estimated_target_amplitude = self.model(mixture_amplitude, latent)
+                else:
+                    estimated_mask = self.model(mixture_amplitude, latent)
+                    estimated_target_amplitude = estimated_mask * mixture_amplitude
+
+            if self.use_amp:
+                estimated_target_amplitude = estimated_target_amplitude.float() # Keep the loss in fp32.
+
             loss = self.criterion(estimated_target_amplitude, target_amplitude)
-            
+
             self.optimizer.zero_grad()
-            loss.backward()
-            
+            self.scaler.scale(loss).backward()
+
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
-            
-            self.optimizer.step()
+
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
             
             train_loss += loss.item()
             
@@ -167,10 +192,13 @@ class AdhocTrainer(TrainerBase):
         Validation
         """
         self.model.eval()
-        
-        valid_loss = 0
+
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
 
+        futures = []
+
         with torch.no_grad():
             for idx, (mixture, target, latent, source_names, scales) in enumerate(self.valid_loader):
                 """
@@ -179,9 +207,9 @@ class AdhocTrainer(TrainerBase):
                 title <list<str>>
                 """
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    target = target.cuda()
-                    latent = latent.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    target = target.cuda(non_blocking=True)
+                    latent = latent.cuda(non_blocking=True)
                 
                 mixture_amplitude = torch.abs(mixture)
                 target_amplitude = torch.abs(target)
@@ -190,9 +218,9 @@ class AdhocTrainer(TrainerBase):
                 estimated_target_amplitude = estimated_mask * mixture_amplitude
                 loss = self.criterion(estimated_target_amplitude, target_amplitude, batch_mean=False)
                 loss = loss.sum(dim=0)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
                 
-                if idx < 5:
+                if idx < 5 and epoch % self.sample_log_every == 0:
                     save_dir = os.path.join(self.sample_dir, "{}".format(idx + 1))
                     os.makedirs(save_dir, exist_ok=True)
 
@@ -206,13 +234,16 @@ class AdhocTrainer(TrainerBase):
                         estimated_source = istft(estimated_sources[idx], self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=False) # (2, T)
                         save_path = os.path.join(save_dir, "epoch{}_{}{}.wav".format(epoch + 1, source_name, scale))
                         estimated_source = self.resampler(estimated_source)
-                        torchaudio.save(save_path, estimated_source, sample_rate=SAMPLE_RATE_MUSDB18, bits_per_sample=BITS_PER_SAMPLE)
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, estimated_source, sample_rate=SAMPLE_RATE_MUSDB18, bits_per_sample=BITS_PER_SAMPLE))
 
                     mixture = istft(mixture, self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=False) # (2, T)
                     save_path = os.path.join(save_dir, "mixture.wav")
                     mixture = self.resampler(mixture)
-                    torchaudio.save(save_path, mixture, sample_rate=SAMPLE_RATE_MUSDB18, bits_per_sample=BITS_PER_SAMPLE)
-        
-        valid_loss /= n_valid
-        
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, mixture, sample_rate=SAMPLE_RATE_MUSDB18, bits_per_sample=BITS_PER_SAMPLE))
+
+        for future in futures:
+            future.result()
+
+        valid_loss = valid_loss.item() / n_valid
+
         return valid_loss
\ No newline at end of file
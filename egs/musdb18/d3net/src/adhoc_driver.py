@@ -1,5 +1,6 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import musdb
 import museval
@@ -52,6 +53,23 @@ class AdhocTrainer(TrainerBase):
 
         self.use_cuda = args.use_cuda
 
+        # Sample WAVs are written off the training thread (see run_one_epoch_eval).
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Export validation samples every `sample_log_every` epochs only.
+        if hasattr(args, 'sample_log_every'):
+            self.sample_log_every = args.sample_log_every
+        else:
+            self.sample_log_every = 10
+
+        # Mixed-precision training (args.use_amp)
+        if hasattr(args, 'use_amp'):
+            self.use_amp = args.use_amp and args.use_cuda
+        else:
+            self.use_amp = False
+
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
+
         if args.continue_from:
             config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
 
@@ -135,23 +153,30 @@ class AdhocTrainer(TrainerBase):
 
         for idx, (mixture, source) in enumerate(self.train_loader):
             if self.use_cuda:
-                mixture = mixture.cuda()
-                source = source.cuda()
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                source = source.cuda(non_blocking=True)
 
             mixture_amplitude = torch.abs(mixture)
             source_amplitude = torch.abs(source)
 
-            estimated_sources_amplitude = self.model(mixture_amplitude)
+            with torch.autocast('cuda', enabled=self.use_amp):
+                estimated_sources_amplitude = self.model(mixture_amplitude)
+
+            if self.use_amp:
+                estimated_sources_amplitude = estimated_sources_amplitude.float() # Keep the loss in fp32.
 
             loss = self.criterion(estimated_sources_amplitude, source_amplitude)
 
             self.optimizer.zero_grad()
-            loss.backward()
+            self.scaler.scale(loss).backward()
 
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
 
-            self.optimizer.step()
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
 
             train_loss += loss.item()
 
@@ -169,9 +194,12 @@ class AdhocTrainer(TrainerBase):
         """
         self.model.eval()
 
-        valid_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
 
+        futures = []
+
         with torch.no_grad():
             for idx, (mixture, source, name) in enumerate(self.valid_loader):
                 """
@@ -180,8 +208,8 @@ class AdhocTrainer(TrainerBase):
                     name <list<str>>: Artist and title of song
                 """
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    source = source.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    source = source.cuda(non_blocking=True)
 
                 batch_size, n_mics, n_bins, n_frames = mixture.size()
 
@@ -191,9 +219,9 @@ class AdhocTrainer(TrainerBase):
                 estimated_source_amplitude = self.model(mixture_amplitude)
                 loss = self.criterion(estimated_source_amplitude, source_amplitude, batch_mean=False)
                 loss = loss.mean(dim=0)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
 
-                if idx < 5:
+                if idx < 5 and epoch % self.sample_log_every == 0:
                     estimated_source = estimated_source_amplitude * torch.exp(1j * torch.angle(mixture)) # (batch_size, n_mics, n_bins, n_frames)
 
                     mixture = mixture.permute(1, 2, 0, 3).reshape(n_mics, n_bins, batch_size * n_frames)
@@ -208,13 +236,16 @@ class AdhocTrainer(TrainerBase):
                     os.makedirs(save_dir, exist_ok=True)
                     save_path = os.path.join(save_dir, "mixture.wav")
                     signal = mixture.unsqueeze(dim=0) if mixture.dim() == 1 else mixture
-                    torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
 
                     save_path = os.path.join(save_dir, "epoch{}.wav".format(epoch + 1))
                     signal = estimated_source.unsqueeze(dim=0) if estimated_source.dim() == 1 else estimated_source
-                    torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
+
+        for future in futures:
+            future.result()
 
-        valid_loss /= n_valid
+        valid_loss = valid_loss.item() / n_valid
 
         return valid_loss
 
@@ -70,6 +70,8 @@ parser.add_argument('--loss_dir', type=str, default='./tmp/loss', help='Loss dir
 parser.add_argument('--sample_dir', type=str, default='./tmp/sample', help='Sample directory')
 parser.add_argument('--continue_from', type=str, default=None, help='Resume training')
 parser.add_argument('--use_cuda', type=int, default=1, help='0: Not use cuda, 1: Use cuda')
+parser.add_argument('--use_amp', type=int, default=0, help='0: Not use automatic mixed precision, 1: Use automatic mixed precision')
+parser.add_argument('--sample_log_every', type=int, default=10, help='Export validation samples every sample_log_every epochs')
 parser.add_argument('--overwrite', type=int, default=0, help='0: NOT overwrite, 1: FORCE overwrite')
 parser.add_argument('--seed', type=int, default=42, help='Random seed')
 
@@ -120,7 +120,9 @@ class WaveTrainDataset(WaveDataset):
             sources = np.concatenate(sources, axis=0)
             mixture = sources.sum(axis=0)
 
-        mixture, target = torch.Tensor(mixture).float(), torch.Tensor(target).float()
+        # Single astype copy + zero-copy from_numpy instead of the double copy of torch.Tensor(...).float().
+        mixture = torch.from_numpy(np.ascontiguousarray(mixture, dtype=np.float32))
+        target = torch.from_numpy(np.ascontiguousarray(target, dtype=np.float32))
 
         return mixture, target
 
@@ -219,8 +221,8 @@ class WaveEvalDataset(WaveDataset):
             else:
                 target = track.targets[self.target].audio.transpose(1, 0)
 
-            mixture = torch.Tensor(mixture).float()
-            target = torch.Tensor(target).float()
+            mixture = torch.from_numpy(np.ascontiguousarray(mixture, dtype=np.float32))
+            target = torch.from_numpy(np.ascontiguousarray(target, dtype=np.float32))
 
             max_samples = max(max_samples, mixture.size(-1))
 
@@ -1,5 +1,6 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 import torchaudio
@@ -47,7 +48,24 @@ class Trainer(TrainerBase):
             self.valid_loss[key] = torch.empty(self.epochs)
         
         self.use_cuda = args.use_cuda
-        
+
+        # Sample WAVs are written off the training thread (see run_one_epoch_eval).
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Export validation samples every `sample_log_every` epochs only.
+        if hasattr(args, 'sample_log_every'):
+            self.sample_log_every = args.sample_log_every
+        else:
+            self.sample_log_every = 10
+
+        # Mixed-precision training (args.use_amp)
+        if hasattr(args, 'use_amp'):
+            self.use_amp = args.use_amp and args.use_cuda
+        else:
+            self.use_amp = False
+
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
+
         if args.continue_from:
             package = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
             
@@ -162,22 +180,30 @@ class Trainer(TrainerBase):
                 _mixture, _sources = self.resamplers[idx](mixture), self.resamplers[idx](sources)
 
                 if self.use_cuda:
-                    _mixture = _mixture.cuda()
-                    _sources = _sources.cuda()
+                    _mixture = _mixture.cuda(non_blocking=True)
+                    _sources = _sources.cuda(non_blocking=True)
                 
                 _mixture, _sources = _mixture.view(batch_size, 1, -1), _sources.view(batch_size * n_sources, 1, -1)
                 mixture_resampled.append(_mixture)
                 sources_resampled.append(_sources)
             
             # Forward
-            if isinstance(self.model, nn.DataParallel):
-                estimated_sources, latent_estimated = self.model.module.extract_latent(mixture_resampled, masking=True, max_stage=self.stage)
-                reconstructed, _ = self.model.module.extract_latent(mixture_resampled, masking=False, max_stage=self.stage)
-                _, latent_target = self.model.module.extract_latent(sources_resampled, masking=False, max_stage=self.stage)
-            else:
-                estimated_sources, latent_estimated = self.model.extract_latent(mixture_resampled, masking=True, max_stage=self.stage)
-                reconstructed, _ = self.model.extract_latent(mixture_resampled, masking=False, max_stage=self.stage)
-                _, latent_target = self.model.extract_latent(sources_resampled, masking=False, max_stage=self.stage)
+            with torch.autocast('cuda', enabled=self.use_amp):
+                if isinstance(self.model, nn.DataParallel):
+                    estimated_sources, latent_estimated = self.model.module.extract_latent(mixture_resampled, masking=True, max_stage=self.stage)
+                    reconstructed, _ = self.model.module.extract_latent(mixture_resampled, masking=False, max_stage=self.stage)
+                    _, latent_target = self.model.module.extract_latent(sources_resampled, masking=False, max_stage=self.stage)
+                else:
+                    estimated_sources, latent_estimated = self.model.extract_latent(mixture_resampled, masking=True, max_stage=self.stage)
+                    reconstructed, _ = self.model.extract_latent(mixture_resampled, masking=False, max_stage=self.stage)
+                    _, latent_target = self.model.extract_latent(sources_resampled, masking=False, max_stage=self.stage)
+
+            if self.use_amp:
+                # Keep the losses in fp32.
+                estimated_sources = [_estimated_sources.float() for _estimated_sources in estimated_sources]
+                reconstructed = [_reconstructed.float() for _reconstructed in reconstructed]
+                latent_estimated = [_latent_estimated.float() for _latent_estimated in latent_estimated]
+                latent_target = [_latent_target.float() for _latent_target in latent_target]
 
             # Main loss
             main_loss = 0
@@ -205,14 +231,16 @@ class Trainer(TrainerBase):
             
             loss = main_loss + self.criterion.weights['reconstruction'] * reconstruction_loss + self.criterion.weights['similarity'] * similarity_loss + self.criterion.weights['dissimilarity'] * dissimilarity_loss
             loss = loss.mean(dim=0)
-            
+
             self.optimizer.zero_grad()
-            loss.backward()
-            
+            self.scaler.scale(loss).backward()
+
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
-            
-            self.optimizer.step()
+
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
             
             train_loss += loss.item()
             train_main_loss += main_loss.item()
@@ -236,15 +264,19 @@ class Trainer(TrainerBase):
         Validation
         """
         self.model.eval()
-        
-        valid_loss = 0
-        valid_main_loss = 0
-        valid_reconstruction_loss = 0
-        valid_similarity_loss = 0
-        valid_dissimilarity_loss = 0
-        
+
+        # Accumulated on device; .item() would force a GPU sync every batch.
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device)
+        valid_main_loss = torch.zeros((), device=device)
+        valid_reconstruction_loss = torch.zeros((), device=device)
+        valid_similarity_loss = torch.zeros((), device=device)
+        valid_dissimilarity_loss = torch.zeros((), device=device)
+
         n_valid = len(self.valid_loader.dataset)
         
+        futures = []
+
         with torch.no_grad():
             for idx, (mixture, sources, titles) in enumerate(self.valid_loader):
                 batch_size, n_sources, T = sources.size()
@@ -256,8 +288,8 @@ class Trainer(TrainerBase):
                     _mixture, _sources = self.resamplers[stage_idx](mixture), self.resamplers[stage_idx](sources)
 
                     if self.use_cuda:
-                        _mixture = _mixture.cuda()
-                        _sources = _sources.cuda()
+                        _mixture = _mixture.cuda(non_blocking=True)
+                        _sources = _sources.cuda(non_blocking=True)
                     
                     _mixture, _sources = _mixture.view(batch_size, 1, -1), _sources.view(batch_size * n_sources, 1, -1)
                     mixture_resampled.append(_mixture)
@@ -307,44 +339,50 @@ class Trainer(TrainerBase):
             
                 loss = main_loss + self.criterion.weights['reconstruction'] * reconstruction_loss + self.criterion.weights['similarity'] * similarity_loss + self.criterion.weights['dissimilarity'] * dissimilarity_loss
 
-                valid_loss += loss.item()
-                valid_main_loss += main_loss.item()
-                valid_reconstruction_loss += reconstruction_loss.item()
-                valid_similarity_loss += similarity_loss.item()
-                valid_dissimilarity_loss += dissimilarity_loss.item()
+                valid_loss += loss.detach()
+                valid_main_loss += main_loss.detach()
+                valid_reconstruction_loss += reconstruction_loss.detach()
+                valid_similarity_loss += similarity_loss.detach()
+                valid_dissimilarity_loss += dissimilarity_loss.detach()
                 
-                if idx < 5:
+                if idx < 5 and epoch % self.sample_log_every == 0:
                     for stage_idx in range(self.stage):
                         _mixture_resampled, _estimated_sources = mixture_resampled[stage_idx], estimated_sources[stage_idx]
                         _sample_rate = self.sample_rate[stage_idx]
 
                         batch_size, n_sources, T = _estimated_sources.size()
 
-                        _mixture_resampled = _mixture_resampled.squeeze(dim=1).cpu() # (batch_size, T)
-                        _estimated_sources = _estimated_sources.squeeze(dim=2).cpu() # (batch_size, n_sources, T)
+                        _mixture_resampled = _mixture_resampled.squeeze(dim=1) # (batch_size, T)
+                        _estimated_sources = _estimated_sources.squeeze(dim=2) # (batch_size, n_sources, T)
+
+                        # Normalize on device before the D2H copy. `amax` is a single fused reduction.
+                        _mixture_resampled = _mixture_resampled / torch.abs(_mixture_resampled).amax().clamp_min(EPS)
+                        norm = torch.abs(_estimated_sources).amax(dim=(0, 2), keepdim=True).clamp_min(EPS)
+                        _estimated_sources = _estimated_sources / norm
+
+                        _mixture_resampled, _estimated_sources = _mixture_resampled.cpu(), _estimated_sources.cpu()
                         _mixture_resampled = _mixture_resampled.contiguous().view(batch_size * T)
                         _estimated_sources = _estimated_sources.permute(1, 0, 2).contiguous().view(n_sources, batch_size * T)
                         
                         save_dir = os.path.join(self.sample_dir, titles)
                         os.makedirs(save_dir, exist_ok=True)
                         save_path = os.path.join(save_dir, "mixture-{}.wav".format(_sample_rate))
-                        norm = torch.abs(_mixture_resampled).max()
-                        _mixture_resampled = _mixture_resampled / torch.clamp(norm, min=EPS)
                         signal = _mixture_resampled.unsqueeze(dim=0) if _mixture_resampled.dim() == 1 else _mixture_resampled
-                        torchaudio.save(save_path, signal, sample_rate=_sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=_sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
                         
                         for source_idx, _estimated_source in enumerate(_estimated_sources):
                             target = self.valid_loader.dataset.target[source_idx]
                             save_path = os.path.join(save_dir, "epoch{}-{}-{}.wav".format(epoch + 1, target, _sample_rate))
-                            norm = torch.abs(_estimated_source).max()
-                            _estimated_source = _estimated_source / torch.clamp(norm, min=EPS)
                             signal = _estimated_source.unsqueeze(dim=0) if _estimated_source.dim() == 1 else _estimated_source
-                            torchaudio.save(save_path, signal, sample_rate=_sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                            futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=_sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
             
-        valid_loss /= n_valid
-        valid_main_loss /= n_valid
-        valid_reconstruction_loss /= n_valid
-        valid_similarity_loss /= n_valid
-        valid_dissimilarity_loss /= n_valid
-        
+        for future in futures:
+            future.result()
+
+        valid_loss = valid_loss.item() / n_valid
+        valid_main_loss = valid_main_loss.item() / n_valid
+        valid_reconstruction_loss = valid_reconstruction_loss.item() / n_valid
+        valid_similarity_loss = valid_similarity_loss.item() / n_valid
+        valid_dissimilarity_loss = valid_dissimilarity_loss.item() / n_valid
+
         return valid_loss, valid_main_loss, valid_reconstruction_loss, valid_similarity_loss, valid_dissimilarity_loss
\ No newline at end of file
@@ -9,7 +9,7 @@ import torch.nn as nn
 
 from utils.utils import set_seed
 from utils.augmentation import SequentialAugmentation, choose_augmentation
-from dataset import SpectrogramTrainDataset, TrainDataLoader
+from dataset import AugmentationSpectrogramTrainDataset, TrainDataLoader
 from adhoc_dataset import SpectrogramEvalDataset, EvalDataLoader
 from adhoc_driver import AdhocTrainer
 from models.mm_dense_lstm import MMDenseLSTM
@@ -18,6 +18,7 @@ from criterion.distance import MeanSquaredError
 parser = argparse.ArgumentParser(description="Training of MMDenseLSTM")
 
 parser.add_argument('--musdb18_root', type=str, default=None, help='Path to MUSDB18')
+parser.add_argument('--cache_dir', type=str, default=None, help='Cache decoded stems as int16 .npy files under this directory')
 parser.add_argument('--config_path', type=str, default=None, help='Path to model configuration file')
 parser.add_argument('--sample_rate', '-sr', type=int, default=44100, help='Sampling rate')
 parser.add_argument('--patch_size', type=int, default=256, help='Patch size')
@@ -41,6 +42,8 @@ parser.add_argument('--loss_dir', type=str, default='./tmp/loss', help='Loss dir
 parser.add_argument('--sample_dir', type=str, default='./tmp/sample', help='Sample directory')
 parser.add_argument('--continue_from', type=str, default=None, help='Resume training')
 parser.add_argument('--use_cuda', type=int, default=1, help='0: Not use cuda, 1: Use cuda')
+parser.add_argument('--use_amp', type=int, default=0, help='0: Not use automatic mixed precision, 1: Use automatic mixed precision')
+parser.add_argument('--sample_log_every', type=int, default=10, help='Export validation samples every sample_log_every epochs')
 parser.add_argument('--overwrite', type=int, default=0, help='0: NOT overwrite, 1: FORCE overwrite')
 parser.add_argument('--num_workers', type=int, default=0, help='# of workers given to data loader for training.')
 parser.add_argument('--seed', type=int, default=42, help='Random seed')
@@ -62,7 +65,7 @@ def main(args):
     for name in config_augmentation['augmentation']:
         augmentation.append(choose_augmentation(name, **config_augmentation[name]))
 
-    train_dataset = SpectrogramTrainDataset(args.musdb18_root, n_fft=args.n_fft, hop_length=args.hop_length, window_fn=args.window_fn, sample_rate=args.sample_rate, patch_samples=patch_samples, samples_per_epoch=args.samples_per_epoch, sources=args.sources, target=args.target, augmentation=augmentation)
+    train_dataset = AugmentationSpectrogramTrainDataset(args.musdb18_root, n_fft=args.n_fft, hop_length=args.hop_length, window_fn=args.window_fn, sample_rate=args.sample_rate, patch_samples=patch_samples, samples_per_epoch=args.samples_per_epoch, sources=args.sources, target=args.target, augmentation=augmentation, cache_dir=args.cache_dir, compute_stft=False)
     valid_dataset = SpectrogramEvalDataset(args.musdb18_root, n_fft=args.n_fft, hop_length=args.hop_length, window_fn=args.window_fn, sample_rate=args.sample_rate, patch_size=args.patch_size, max_samples=max_samples, sources=args.sources, target=args.target)
 
     print("Training dataset includes {} samples.".format(len(train_dataset)))
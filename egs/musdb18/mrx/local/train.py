@@ -18,6 +18,7 @@ from criterion.sdr import NegSISDR
 parser = argparse.ArgumentParser(description="Training of Multi-Resolution CrossNet (MRX)")
 
 parser.add_argument('--musdb18_root', type=str, default=None, help='Path to MUSDB18')
+parser.add_argument('--cache_dir', type=str, default=None, help='Cache decoded stems as int16 .npy files under this directory')
 parser.add_argument('--config_path', type=str, default=None, help='Path to model configuration file')
 parser.add_argument('--sample_rate', '-sr', type=int, default=44100, help='Sampling rate')
 parser.add_argument('--duration', type=float, default=6, help='Duration')
@@ -38,6 +39,8 @@ parser.add_argument('--sample_dir', type=str, default='./tmp/sample', help='Samp
 parser.add_argument('--continue_from', type=str, default=None, help='Resume training')
 parser.add_argument('--use_norbert', type=int, default=0, help='Use norbert.wiener for multichannel wiener filetering. 0: Not use norbert, 1: Use norbert (you have to install norbert)')
 parser.add_argument('--use_cuda', type=int, default=1, help='0: Not use cuda, 1: Use cuda')
+parser.add_argument('--use_amp', type=int, default=0, help='0: Not use automatic mixed precision, 1: Use automatic mixed precision')
+parser.add_argument('--sample_log_every', type=int, default=10, help='Export validation samples every sample_log_every epochs')
 parser.add_argument('--overwrite', type=int, default=0, help='0: NOT overwrite, 1: FORCE overwrite')
 parser.add_argument('--num_workers', type=int, default=0, help='# of workers given to data loader for training.')
 parser.add_argument('--seed', type=int, default=42, help='Random seed')
@@ -63,7 +66,8 @@ def main(args):
         sample_rate=args.sample_rate, duration=args.duration, samples_per_epoch=args.samples_per_epoch,
         sources=args.sources, target=args.sources,
         include_valid=True,
-        augmentation=augmentation
+        augmentation=augmentation,
+        cache_dir=args.cache_dir
     )
     valid_dataset = WaveEvalDataset(args.musdb18_root, sample_rate=args.sample_rate, patch_duration=args.duration, max_duration=args.valid_duration, sources=args.sources, target=args.sources)
     
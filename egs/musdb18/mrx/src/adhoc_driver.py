@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 import torchaudio
@@ -24,19 +25,27 @@ class AdhocTrainer(TrainerBase):
         
         for idx, (mixture, sources) in enumerate(self.train_loader):
             if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
             
-            estimated_sources = self.model(mixture)
+            with torch.autocast('cuda', enabled=self.use_amp):
+                estimated_sources = self.model(mixture)
+
+            if self.use_amp:
+                estimated_sources = estimated_sources.float() # Keep the loss in fp32.
+
             loss = self.criterion(estimated_sources, sources)
-            
+
             self.optimizer.zero_grad()
-            loss.backward()
-            
+            self.scaler.scale(loss).backward()
+
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
-            
-            self.optimizer.step()
+
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
             
             train_loss += loss.item()
             
@@ -53,9 +62,12 @@ class AdhocTrainer(TrainerBase):
         """
         self.model.eval()
         
-        valid_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
         
+        futures = []
+
         with torch.no_grad():
             for idx, (mixture, sources, titles) in enumerate(self.valid_loader):
                 """
@@ -63,8 +75,8 @@ class AdhocTrainer(TrainerBase):
                 sources: (batch_size, len(sources), n_mics, patch_samples)
                 """
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
 
                 estimated_sources = self.model(mixture)
 
@@ -78,21 +90,25 @@ class AdhocTrainer(TrainerBase):
                 estimated_sources = estimated_sources.reshape(*estimated_sources.size()[:-2], -1) # (n_sources, n_mics, batch_size * patch_samples)
 
                 loss = self.criterion(estimated_sources, sources, batch_mean=True)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
                 
-                if idx < 5:
-                    mixture = mixture.squeeze(dim=0).detach().cpu()
-                    estimated_sources = estimated_sources.detach().cpu()
+                if idx < 5 and epoch % self.sample_log_every == 0:
+                    mixture = mixture.squeeze(dim=0).detach()
+                    estimated_sources = estimated_sources.detach()
+
+                    if self.save_normalized:
+                        # Normalize on device before the D2H copy. `amax` is a single fused reduction.
+                        mixture = mixture / torch.abs(mixture).amax().clamp_min(EPS)
+                        norm = torch.abs(estimated_sources).amax(dim=(-2, -1), keepdim=True).clamp_min(EPS)
+                        estimated_sources = estimated_sources / norm
+
+                    mixture, estimated_sources = mixture.cpu(), estimated_sources.cpu()
                     
                     save_dir = os.path.join(self.sample_dir, titles)
                     os.makedirs(save_dir, exist_ok=True)
                     save_path = os.path.join(save_dir, "mixture.wav")
-
-                    if self.save_normalized:
-                        norm = torch.abs(mixture).max()
-                        mixture = mixture / norm
                     
-                    torchaudio.save(save_path, mixture, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, mixture, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
                     
                     save_dir = os.path.join(self.sample_dir, titles, "epoch{}".format(epoch + 1))
                     os.makedirs(save_dir, exist_ok=True)
@@ -101,14 +117,13 @@ class AdhocTrainer(TrainerBase):
                         target = self.valid_loader.dataset.target[source_idx]
                         save_path = os.path.join(save_dir, "{}.wav".format(target))
                         
-                        if self.save_normalized:
-                            norm = torch.abs(estimated_source).max()
-                            estimated_source = estimated_source / norm
-                        
-                        torchaudio.save(save_path, estimated_source, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
-        
-        valid_loss /= n_valid
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, estimated_source, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
         
+        for future in futures:
+            future.result()
+
+        valid_loss = valid_loss.item() / n_valid
+
         return valid_loss
 
     def save_model(self, epoch, model_path='./tmp.pth'):
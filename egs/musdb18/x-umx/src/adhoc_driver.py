@@ -1,5 +1,6 @@
 import os
 import time
+from concurrent.futures import ThreadPoolExecutor
 
 import musdb
 import museval
@@ -59,7 +60,24 @@ class AdhocSchedulerTrainer(TrainerBase):
         
         self.use_cuda = args.use_cuda
         self.use_norbert = args.use_norbert
-        
+
+        # Sample WAVs are written off the training thread (see run_one_epoch_eval).
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Export validation samples every `sample_log_every` epochs only.
+        if hasattr(args, 'sample_log_every'):
+            self.sample_log_every = args.sample_log_every
+        else:
+            self.sample_log_every = 10
+
+        # Mixed-precision training (args.use_amp)
+        if hasattr(args, 'use_amp'):
+            self.use_amp = args.use_amp and args.use_cuda
+        else:
+            self.use_amp = False
+
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
+
         if args.continue_from:
             config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
             
@@ -185,10 +203,12 @@ class AdhocSchedulerTrainer(TrainerBase):
         Validation
         """
         self.model.eval()
-        
+
         valid_loss = 0
         n_valid = len(self.valid_loader.dataset)
         
+        futures = []
+
         with torch.no_grad():
             for idx, (mixture, sources, name) in enumerate(self.valid_loader):
                 """
@@ -197,8 +217,8 @@ class AdhocSchedulerTrainer(TrainerBase):
                     name <list<str>>: Artist and title of song
                 """
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
 
                 mixture_amplitude = torch.abs(mixture)
 
@@ -206,10 +226,8 @@ class AdhocSchedulerTrainer(TrainerBase):
 
                 loss = self.criterion(estimated_sources_amplitude, sources, batch_mean=False)
 
-                if self.combination:
-                    valid_loss += loss.mean(dim=0).item()
-                else:
-                    valid_loss += loss.mean(dim=0).detach() # (n_sources,)
+                # Accumulated on device; .item() would force a GPU sync every batch.
+                valid_loss += loss.mean(dim=0).detach() # () if combination else (n_sources,)
 
                 batch_size, n_sources, n_mics, n_bins, n_frames = estimated_sources_amplitude.size()
 
@@ -218,7 +236,7 @@ class AdhocSchedulerTrainer(TrainerBase):
                 mixture = mixture.reshape(n_mics, n_bins, batch_size * n_frames)
                 estimated_sources_amplitude = estimated_sources_amplitude.reshape(n_sources, n_mics, n_bins, batch_size * n_frames)
 
-                if idx < 5:
+                if idx < 5 and epoch % self.sample_log_every == 0:
                     mixture = mixture.cpu()
                     estimated_sources_amplitude = estimated_sources_amplitude.cpu()
 
@@ -240,7 +258,7 @@ class AdhocSchedulerTrainer(TrainerBase):
 
                     save_path = os.path.join(track_dir, "mixture.wav")
                     signal = mixture.unsqueeze(dim=0) if mixture.dim() == 1 else mixture
-                    torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
 
                     epoch_dir = os.path.join(track_dir, "epoch{}".format(epoch + 1))
                     os.makedirs(epoch_dir, exist_ok=True)
@@ -248,10 +266,16 @@ class AdhocSchedulerTrainer(TrainerBase):
                     for target, estimated_source in zip(self.sources, estimated_sources):
                         save_path = os.path.join(epoch_dir, "{}.wav".format(target))
                         signal = estimated_source.unsqueeze(dim=0) if estimated_source.dim() == 1 else estimated_source
-                        torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18)
-        
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_MUSDB18))
+
+        for future in futures:
+            future.result()
+
         valid_loss /= n_valid
-        
+
+        if self.combination:
+            valid_loss = valid_loss.item() # run_combination expects a float; the per-source branch returns the (n_sources,) tensor as before.
+
         return valid_loss
     
     def run_one_epoch_train_combination(self, epoch):
@@ -269,24 +293,31 @@ class AdhocSchedulerTrainer(TrainerBase):
                 sources: (batch_size, n_sources, n_mics, n_bins, n_frames)
             """
             if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
             
             mixture_amplitude = torch.abs(mixture)
 
-            estimated_sources_amplitude = self.model(mixture_amplitude)
-            
+            with torch.autocast('cuda', enabled=self.use_amp):
+                estimated_sources_amplitude = self.model(mixture_amplitude)
+
+            if self.use_amp:
+                estimated_sources_amplitude = estimated_sources_amplitude.float() # Keep the loss in fp32.
+
             loss = self.criterion(estimated_sources_amplitude, sources)
 
             mean_loss = loss
 
             self.optimizer.zero_grad()
-            mean_loss.backward()
-            
+            self.scaler.scale(mean_loss).backward()
+
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
-            
-            self.optimizer.step()
+
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
             
             train_loss += mean_loss.item()
 
@@ -315,24 +346,31 @@ class AdhocSchedulerTrainer(TrainerBase):
                 sources: (batch_size, n_sources, n_mics, n_bins, n_frames)
             """
             if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
+                # With pin_memory=True on the loader, these copies overlap the previous batch's compute.
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
             
             mixture_amplitude = torch.abs(mixture)
 
-            estimated_sources_amplitude = self.model(mixture_amplitude)
-            
+            with torch.autocast('cuda', enabled=self.use_amp):
+                estimated_sources_amplitude = self.model(mixture_amplitude)
+
+            if self.use_amp:
+                estimated_sources_amplitude = estimated_sources_amplitude.float() # Keep the loss in fp32.
+
             loss = self.criterion(estimated_sources_amplitude, sources)
 
             mean_loss = loss.mean(dim=0)
 
             self.optimizer.zero_grad()
-            mean_loss.backward()
-            
+            self.scaler.scale(mean_loss).backward()
+
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
-            
-            self.optimizer.step()
+
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
             
             train_loss += loss.detach()
 
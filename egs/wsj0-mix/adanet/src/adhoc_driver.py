@@ -163,7 +163,7 @@ class AdhocTrainer(TrainerBase):
 
             loss = self.criterion(estimated_sources_amplitude, target_amplitude)
 
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
 
             if self.max_norm:
@@ -610,7 +610,7 @@ class AdhocFinetuner(TrainerBase):
 
             loss = self.criterion(estimated_sources_amplitude, target_amplitude)
 
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
 
             if self.max_norm:
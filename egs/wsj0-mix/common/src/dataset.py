@@ -1,14 +1,238 @@
 import os
-
+import random
+import pickle
+import hashlib
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+import numpy as np
+import soundfile as sf
 import torch
 import torchaudio
-import torch.nn as nn
 
-from utils.audio import build_window
+from utils.audio import cached_window
 from transforms.stft import stft
 from algorithm.frequency_mask import compute_ideal_binary_mask, compute_ideal_ratio_mask, compute_wiener_filter_mask
 
 EPS = 1e-12
+MAX_OPEN_FILES = 64
+MAX_CACHED_WAVEFORMS = 256
+
+_sound_files = OrderedDict()
+
+def _get_sound_file(path):
+    """
+    Bounded pool of open SoundFile handles, living per DataLoader worker.
+    Re-decoding a file skips the open()/header-parse cost; the least
+    recently used handle is closed once the pool is full.
+    """
+    sound_file = _sound_files.get(path)
+    
+    if sound_file is None:
+        sound_file = sf.SoundFile(path)
+        
+        while len(_sound_files) >= MAX_OPEN_FILES:
+            _, oldest = _sound_files.popitem(last=False)
+            oldest.close()
+        
+        _sound_files[path] = sound_file
+    else:
+        _sound_files.move_to_end(path)
+    
+    return sound_file
+
+@lru_cache(maxsize=None)
+def read_wav_info(path):
+    """
+    Read the WAV header only, instead of decoding the whole file.
+    Args:
+        path <str>: Path to WAV file
+    Returns:
+        T_total <int>: Number of samples
+        sample_rate <int>: Sampling rate
+    """
+    audio_info = sf.info(path)
+
+    return audio_info.frames, audio_info.samplerate
+
+@lru_cache(maxsize=MAX_CACHED_WAVEFORMS)
+def _read_wav_full(path):
+    """
+    Decode the whole file once and keep it cached. Overlapping training
+    windows (overlap = samples // 2) touch each file about twice per epoch,
+    so the second decode is served from memory. The cache lives per
+    DataLoader worker process, which is forked after dataset construction.
+    Args:
+        path <str>: Path to WAV file
+    Returns:
+        waveform (n_channels, T_total) <np.ndarray>
+    """
+    sound_file = _get_sound_file(path)
+    sound_file.seek(0)
+    waveform = sound_file.read(dtype='float32', always_2d=True)
+
+    # Transposed view of the frames-major decode. Rewriting it contiguously
+    # would cost a full-file copy; slicing and copyto handle the strides.
+    return waveform.T
+
+def _read_wav_segment(path, start, end, out=None):
+    """
+    Slice the requested frames out of the cached waveform without copying.
+    Args:
+        path <str>: Path to WAV file
+        start <int>: First frame
+        end <int>: Last frame (exclusive)
+        out (end - start,) <np.ndarray>: Optional destination. The cached
+            slice is copied straight into it in one memcpy, with no
+            intermediate tensor.
+    Returns:
+        waveform (n_channels, end - start) <torch.Tensor> if `out` is None
+    """
+    waveform = _read_wav_full(path)
+
+    if out is None:
+        return torch.from_numpy(waveform[:, start:end])
+    
+    np.copyto(out, waveform[:, start:end].reshape(out.shape))
+
+def _metadata_cache_path(list_path, **params):
+    """
+    Sidecar path for the segment index, keyed on every parameter that
+    determines its content.
+    """
+    key = hashlib.md5('_'.join('{}-{}'.format(key, params[key]) for key in sorted(params)).encode()).hexdigest()
+    
+    return '{}.meta.{}.pkl'.format(list_path, key)
+
+def _load_metadata_cache(dataset, cache_path):
+    """
+    Restore the flat index arrays from a sidecar if it is newer than the
+    list file. Returns True on a hit, so __init__ can skip the WAV scan.
+    """
+    if not os.path.exists(cache_path):
+        return False
+    
+    if os.path.getmtime(cache_path) <= os.path.getmtime(dataset.list_path):
+        return False
+    
+    with open(cache_path, 'rb') as f:
+        index = pickle.load(f)
+    
+    dataset.ids = index['ids']
+    dataset.starts = index['starts']
+    dataset.ends = index['ends']
+    dataset.mixture_paths = index['mixture_paths']
+    dataset.source_paths = index['source_paths']
+    
+    return True
+
+def _save_metadata_cache(dataset, cache_path):
+    index = {
+        'ids': dataset.ids,
+        'starts': dataset.starts,
+        'ends': dataset.ends,
+        'mixture_paths': dataset.mixture_paths,
+        'source_paths': dataset.source_paths
+    }
+    
+    try:
+        with open(cache_path, 'wb') as f:
+            pickle.dump(index, f)
+    except OSError:
+        pass # Read-only list directory. The cache is only an optimization.
+
+def _prefetch_wav_info(wav_root, list_path):
+    """
+    Warm the memoized `read_wav_info` cache for every mixture in the list.
+    Threads overlap the filesystem latency of thousands of header reads,
+    so the metadata loops below are served from memory.
+    """
+    with open(list_path) as f:
+        wav_paths = [os.path.join(wav_root, 'mix', '{}.wav'.format(line.strip())) for line in f]
+    
+    with ThreadPoolExecutor(max_workers=min(32, os.cpu_count() or 1)) as executor:
+        for _ in executor.map(read_wav_info, wav_paths):
+            pass
+
+def _enumerate_segments(T_total, samples, overlap):
+    """
+    Enumerate window starts for one file. A single C-level arange covers
+    what used to be a per-window Python loop.
+    Args:
+        T_total <int>: Number of samples in file
+        samples <int>: Window length
+        overlap <int>: Overlap between consecutive windows
+    Returns:
+        starts (n_segments,) <np.ndarray>: int32; sample counts fit comfortably
+            and the index stays 4 bytes per entry.
+    """
+    return np.arange(0, T_total - samples + 1, samples - overlap, dtype=np.int32)
+
+def _list_source_ids(wav_root, max_n_sources):
+    """
+    List each source directory once and return the WAV names as sets.
+    Membership tests then replace the per-(ID, source) os.path.exists
+    probing, i.e. one readdir per directory instead of a stat() per file.
+    """
+    source_id_sets = []
+    
+    for source_idx in range(max_n_sources):
+        source_dir = os.path.join(wav_root, 's{}'.format(source_idx + 1))
+        
+        if os.path.isdir(source_dir):
+            source_id_sets.append(set(os.listdir(source_dir)))
+        else:
+            source_id_sets.append(set())
+    
+    return source_id_sets
+
+
+def _build_full_utterance_index(dataset, wav_root, list_path, max_samples, n_sources=None, source_id_sets=None):
+    """
+    Shared eval/test index builder: one entry per utterance, spanning the
+    whole file up to `max_samples`. With `source_id_sets`, the number of
+    sources is counted per utterance from the directory listings
+    (mixed-source corpora); otherwise `n_sources` is fixed.
+    """
+    _prefetch_wav_info(wav_root, list_path)
+    
+    ids, ends, source_paths = [], [], []
+    
+    with open(list_path) as f:
+        for line in f:
+            ID = line.strip()
+            wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
+            
+            T_total, _ = read_wav_info(wav_path)
+            
+            if max_samples is None:
+                samples = T_total
+            else:
+                if T_total < max_samples:
+                    samples = T_total
+                else:
+                    samples = max_samples
+            
+            if source_id_sets is None:
+                track_n_sources = n_sources
+            else:
+                track_n_sources = 0
+                
+                for source_idx in range(len(source_id_sets)):
+                    if '{}.wav'.format(ID) not in source_id_sets[source_idx]:
+                        break
+                    track_n_sources += 1
+            
+            ids.append(ID)
+            ends.append(samples)
+            source_paths.append([os.path.join(wav_root, 's{}'.format(source_idx + 1), '{}.wav'.format(ID)) for source_idx in range(track_n_sources)])
+    
+    dataset.ids = ids
+    dataset.starts = np.zeros(len(ids), dtype=np.int32)
+    dataset.ends = np.array(ends, dtype=np.int32)
+    dataset.mixture_paths = [os.path.join(wav_root, 'mix', '{}.wav'.format(ID)) for ID in ids]
+    dataset.source_paths = source_paths
 
 class WSJ0Dataset(torch.utils.data.Dataset):
     def __init__(self, wav_root, list_path):
@@ -17,6 +241,17 @@ class WSJ0Dataset(torch.utils.data.Dataset):
         self.wav_root = os.path.abspath(wav_root)
         self.list_path = os.path.abspath(list_path)
 
+    def _finalize_index(self):
+        """
+        Flatten `json_data` into structure-of-arrays storage. `__getitem__`
+        then indexes plain arrays instead of walking nested dicts per call.
+        """
+        self.ids = [data['ID'] for data in self.json_data]
+        self.starts = np.array([data['mixture']['start'] for data in self.json_data], dtype=np.int32)
+        self.ends = np.array([data['mixture']['end'] for data in self.json_data], dtype=np.int32)
+        self.mixture_paths = [os.path.join(self.wav_root, data['mixture']['path']) for data in self.json_data]
+        self.source_paths = [[os.path.join(self.wav_root, source_data['path']) for source_data in data['sources'].values()] for data in self.json_data]
+
 class WaveDataset(WSJ0Dataset):
     def __init__(self, wav_root, list_path, samples=32000, overlap=None, n_sources=2):
         super().__init__(wav_root, list_path)
@@ -27,43 +262,37 @@ class WaveDataset(WSJ0Dataset):
         if overlap is None:
             overlap = samples // 2
         
-        self.json_data = []
+        cache_path = _metadata_cache_path(list_path, wav_root=wav_root, samples=samples, overlap=overlap, n_sources=n_sources)
+        
+        if _load_metadata_cache(self, cache_path):
+            return
+        
+        ids, starts = [], []
+        
+        _prefetch_wav_info(wav_root, list_path)
         
         with open(list_path) as f:
             for line in f:
                 ID = line.strip()
                 wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
                 
-                wave, _ = torchaudio.load(wav_path)
-                _, T_total = wave.size()
+                T_total, _ = read_wav_info(wav_path)
                 
-                for start_idx in range(0, T_total, samples - overlap):
-                    end_idx = start_idx + samples
-                    if end_idx > T_total:
-                        break
-                    data = {
-                        'sources': {},
-                        'mixture': {}
-                    }
-                    
-                    for source_idx in range(n_sources):
-                        source_data = {
-                            'path': os.path.join('s{}'.format(source_idx + 1), '{}.wav'.format(ID)),
-                            'start': start_idx,
-                            'end': end_idx
-                        }
-                        data['sources']['s{}'.format(source_idx + 1)] = source_data
-                    
-                    mixture_data = {
-                        'path': os.path.join('mix', '{}.wav'.format(ID)),
-                        'start': start_idx,
-                        'end': end_idx
-                    }
-                    data['mixture'] = mixture_data
-                    data['ID'] = ID
+                track_starts = _enumerate_segments(T_total, samples, overlap)
                 
-                    self.json_data.append(data)
+                ids.extend([ID] * len(track_starts))
+                starts.append(track_starts)
         
+        self.ids = ids
+        self.starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int32)
+        self.ends = self.starts + samples
+        self.mixture_paths = [os.path.join(wav_root, 'mix', '{}.wav'.format(ID)) for ID in ids]
+        
+        source_dirs = [os.path.join(wav_root, 's{}'.format(source_idx + 1)) for source_idx in range(n_sources)]
+        self.source_paths = [[os.path.join(source_dir, '{}.wav'.format(ID)) for source_dir in source_dirs] for ID in ids]
+        
+        _save_metadata_cache(self, cache_path)
+
     def __getitem__(self, idx):
         """
         Returns:
@@ -71,29 +300,26 @@ class WaveDataset(WSJ0Dataset):
             sources (n_sources, T) <torch.Tensor>
             segment_ID <str>
         """
-        data = self.json_data[idx]
-        sources = []
-        
-        for key in data['sources'].keys():
-            source_data = data['sources'][key]
-            start, end = source_data['start'], source_data['end']
-            wav_path = os.path.join(self.wav_root, source_data['path'])
-            wave, _ = torchaudio.load(wav_path, frame_offset=start, num_frames=end-start)
-            sources.append(wave)
-        
-        sources = torch.cat(sources, dim=0)
-        
-        mixture_data = data['mixture']
-        start, end = mixture_data['start'], mixture_data['end']
-        wav_path = os.path.join(self.wav_root, mixture_data['path'])
-        mixture, _ = torchaudio.load(wav_path, frame_offset=start, num_frames=end-start)
+        # Unbox the int32 entries once; everything below slices with plain ints.
+        start, end = int(self.starts[idx]), int(self.ends[idx])
+        source_paths = self.source_paths[idx]
+        
+        # Preallocated output; each source is copied straight into its row
+        # through the shared-storage numpy view.
+        sources = torch.empty(len(source_paths), end - start, dtype=torch.float32)
+        sources_view = sources.numpy()
+        
+        for source_idx, source_path in enumerate(source_paths):
+            _read_wav_segment(source_path, start, end, out=sources_view[source_idx])
+        
+        mixture = _read_wav_segment(self.mixture_paths[idx], start, end)
             
-        segment_ID = self.json_data[idx]['ID'] + '_{}-{}'.format(start, end)
+        segment_ID = self.ids[idx] + '_{}-{}'.format(start, end)
         
         return mixture, sources, segment_ID
         
     def __len__(self):
-        return len(self.json_data)
+        return len(self.starts)
 
 class WaveTrainDataset(WaveDataset):
     def __init__(self, wav_root, list_path, samples=32000, overlap=None, n_sources=2):
@@ -106,56 +332,24 @@ class WaveTrainDataset(WaveDataset):
 
 class WaveEvalDataset(WaveDataset):
     def __init__(self, wav_root, list_path, max_samples=None, n_sources=2):
-        super().__init__(wav_root, list_path, n_sources=n_sources)
+        # Skip WaveDataset.__init__: it would scan and segment every WAV with
+        # training defaults, only for the index to be rebuilt below.
+        WSJ0Dataset.__init__(self, wav_root, list_path)
 
         wav_root = os.path.abspath(wav_root)
         list_path = os.path.abspath(list_path)
 
-        self.json_data = []
+        cache_path = _metadata_cache_path(list_path, wav_root=wav_root, max_samples=max_samples, n_sources=n_sources)
         
-        with open(list_path) as f:
-            for line in f:
-                ID = line.strip()
-                wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
+        if _load_metadata_cache(self, cache_path):
+            return
+
+        _build_full_utterance_index(self, wav_root, list_path, max_samples, n_sources=n_sources)
+        _save_metadata_cache(self, cache_path)
 
-                wave, _ = torchaudio.load(wav_path)
-                
-                _, T_total = wave.size()
-                
-                if max_samples is None:
-                    samples = T_total
-                else:
-                    if T_total < max_samples:
-                        samples = T_total
-                    else:
-                        samples = max_samples
-                
-                data = {
-                    'sources': {},
-                    'mixture': {}
-                }
-                
-                for source_idx in range(n_sources):
-                    source_data = {
-                        'path': os.path.join('s{}'.format(source_idx + 1), '{}.wav'.format(ID)),
-                        'start': 0,
-                        'end': samples
-                    }
-                    data['sources']['s{}'.format(source_idx + 1)] = source_data
-                
-                mixture_data = {
-                    'path': os.path.join('mix', '{}.wav'.format(ID)),
-                    'start': 0,
-                    'end': samples
-                }
-                data['mixture'] = mixture_data
-                data['ID'] = ID
-            
-                self.json_data.append(data)
-    
     def __getitem__(self, idx):
         mixture, sources, _ = super().__getitem__(idx)
-        segment_ID = self.json_data[idx]['ID']
+        segment_ID = self.ids[idx]
     
         return mixture, sources, segment_ID
 
@@ -175,27 +369,41 @@ class WaveTestDataset(WaveEvalDataset):
         return mixture, sources, segment_ID
 
 class SpectrogramDataset(WaveDataset):
-    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, samples=32000, overlap=None, n_sources=2):
+    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, samples=32000, overlap=None, n_sources=2, compute_stft=True):
+        """
+        Args:
+            compute_stft <bool>: If False, waveforms are returned as they are
+                and the trainer is expected to run one batched STFT on the
+                device, instead of one CPU STFT per sample in each worker.
+        """
         super().__init__(wav_root, list_path, samples=samples, overlap=overlap, n_sources=n_sources)
-        
+
+        self._set_stft_params(n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, compute_stft=compute_stft)
+
+    def _set_stft_params(self, n_fft, hop_length=None, window_fn='hann', normalize=False, compute_stft=True):
+        """
+        Separated from `__init__` so eval subclasses can configure the STFT
+        without running the training-style segmentation scan.
+        """
         if hop_length is None:
             hop_length = n_fft // 2
-        
+
         self.n_fft, self.hop_length = n_fft, hop_length
         self.n_bins = n_fft // 2 + 1
 
         if window_fn:
-            self.window = build_window(n_fft, window_fn=window_fn)
+            self.window = cached_window(n_fft, window_fn=window_fn)
         else:
             self.window = None
-        
+
         self.normalize = normalize
-        
+        self.compute_stft = compute_stft
+
     def __getitem__(self, idx):
         """
         Returns:
-            mixture (1, n_bins, n_frames) <torch.Tensor>
-            sources (n_sources, n_bins, n_frames) <torch.Tensor>
+            mixture (1, n_bins, n_frames) <torch.Tensor>, or (1, T) if `compute_stft` is False
+            sources (n_sources, n_bins, n_frames) <torch.Tensor>, or (n_sources, T) if `compute_stft` is False
             T (), <int>: Number of samples in time-domain
             segment_ID <str>
         """
@@ -203,15 +411,67 @@ class SpectrogramDataset(WaveDataset):
 
         T = mixture.size(-1)
 
-        mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (1, n_bins, n_frames)
-        sources = stft(sources, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (n_sources, n_bins, n_frames)
+        if self.compute_stft:
+            # `mixture` can be a strided view of the worker's decode cache; one
+            # explicit copy here beats the implicit one torch.stft would make
+            # inside the FFT. `sources` is already a contiguous preallocation.
+            mixture = mixture.contiguous()
+            mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (1, n_bins, n_frames)
+            sources = stft(sources, n_fft=self.n_fft, hop_length=self.hop_length, window=self.window, normalized=self.normalize, return_complex=True) # (n_sources, n_bins, n_frames)
         
         return mixture, sources, T, segment_ID
 
+def compute_ideal_mask_and_threshold_weight(generate_mask, mixture, sources, threshold=40, eps=EPS):
+    """
+    Ideal mask and low-energy bin weighting for (batches of) spectrograms.
+    Device-agnostic: with `compute_mask=False` on the dataset, trainers call
+    this once per batch on the device instead of once per sample inside each
+    DataLoader worker.
+    Args:
+        generate_mask <callable>: One of the compute_*_mask functions.
+        mixture (1, n_bins, n_frames) or (batch_size, 1, n_bins, n_frames) <torch.Tensor>: Complex tensor
+        sources (n_sources, n_bins, n_frames) or (batch_size, n_sources, n_bins, n_frames) <torch.Tensor>: Complex tensor
+        threshold <float>: Dynamic range in dB below the (per-sample) peak; None skips the weighting.
+    Returns:
+        ideal_mask: Same shape as `sources`
+        threshold_weight: Same shape as `mixture`
+    """
+    # The mask functions handle complex input themselves; IBM/WFM work in the
+    # power domain there and never materialize the source amplitudes.
+    ideal_mask = generate_mask(sources)
+
+    mixture_amplitude = torch.abs(mixture)
+
+    if threshold is None:
+        threshold_weight = torch.ones_like(mixture_amplitude)
+    else:
+        log_amplitude = 20 * torch.log10(mixture_amplitude + eps)
+        # keepdim reduction, so each sample of a batch is gated by its own peak.
+        max_log_amplitude = log_amplitude.amax(dim=(-3, -2, -1), keepdim=True)
+        threshold = 10**((max_log_amplitude - threshold) / 20)
+        # Boolean comparison cast to float; cheaper than torch.where with two materialized operands.
+        threshold_weight = (mixture_amplitude > threshold).to(mixture_amplitude.dtype)
+
+    return ideal_mask, threshold_weight
+
 class IdealMaskSpectrogramDataset(SpectrogramDataset):
-    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, mask_type='ibm', threshold=40, samples=32000, overlap=None, n_sources=2, eps=EPS):
-        super().__init__(wav_root, list_path, n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, samples=samples, overlap=overlap, n_sources=n_sources)
-        
+    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, mask_type='ibm', threshold=40, samples=32000, overlap=None, n_sources=2, compute_stft=True, compute_mask=True, eps=EPS):
+        """
+        Args:
+            compute_stft <bool>: Forwarded to `SpectrogramDataset`. With
+                `compute_stft=False` and `compute_mask=False`, `__getitem__`
+                returns raw waveforms and the trainer runs one batched STFT
+                plus mask generation on the device.
+            compute_mask <bool>: If False, the ideal mask and threshold weight
+                are left to the trainer, which runs
+                `compute_ideal_mask_and_threshold_weight` on batched device
+                tensors; `__getitem__` then returns the spectrograms only.
+        """
+        super().__init__(wav_root, list_path, n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, samples=samples, overlap=overlap, n_sources=n_sources, compute_stft=compute_stft)
+
+        self._set_mask_params(mask_type, threshold=threshold, compute_mask=compute_mask, eps=eps)
+
+    def _set_mask_params(self, mask_type, threshold=40, compute_mask=True, eps=EPS):
         if mask_type == 'ibm':
             self.generate_mask = compute_ideal_binary_mask
         elif mask_type == 'irm':
@@ -220,8 +480,9 @@ class IdealMaskSpectrogramDataset(SpectrogramDataset):
             self.generate_mask = compute_wiener_filter_mask
         else:
             raise NotImplementedError("Not support mask {}".format(mask_type))
-        
+
         self.threshold = threshold
+        self.compute_mask = compute_mask
         self.eps = eps
     
     def __getitem__(self, idx):
@@ -229,29 +490,23 @@ class IdealMaskSpectrogramDataset(SpectrogramDataset):
         Returns:
             mixture (1, n_bins, n_frames) <torch.Tensor>
             sources (n_sources, n_bins, n_frames) <torch.Tensor>
-            ideal_mask (n_sources, n_bins, n_frames) <torch.Tensor>
-            threshold_weight (1, n_bins, n_frames) <torch.Tensor>
+            ideal_mask (n_sources, n_bins, n_frames) <torch.Tensor>: Omitted if `compute_mask` is False
+            threshold_weight (1, n_bins, n_frames) <torch.Tensor>: Omitted if `compute_mask` is False
             T (), <int>: Number of samples in time-domain
             segment_ID <str>
         """
-        threshold = self.threshold
-        eps = self.eps
-        
         mixture, sources, T, segment_ID = super().__getitem__(idx) # (1, n_bins, n_frames), (n_sources, n_bins, n_frames)
-        sources_amplitude = torch.abs(sources)
-        ideal_mask = self.generate_mask(sources_amplitude)
-        
-        mixture_amplitude = torch.abs(mixture)
-        log_amplitude = 20 * torch.log10(mixture_amplitude + eps)
-        max_log_amplitude = torch.max(log_amplitude)
-        threshold = 10**((max_log_amplitude - threshold) / 20)
-        threshold_weight = torch.where(mixture_amplitude > threshold, torch.ones_like(mixture_amplitude), torch.zeros_like(mixture_amplitude))
-        
+
+        if not self.compute_mask:
+            return mixture, sources, T, segment_ID
+
+        ideal_mask, threshold_weight = compute_ideal_mask_and_threshold_weight(self.generate_mask, mixture, sources, threshold=self.threshold, eps=self.eps)
+
         return mixture, sources, ideal_mask, threshold_weight, T, segment_ID
 
 class IdealMaskSpectrogramTrainDataset(IdealMaskSpectrogramDataset):
-    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, mask_type='ibm', threshold=40, samples=32000, overlap=None, n_sources=2, eps=EPS):
-        super().__init__(wav_root, list_path, n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, mask_type=mask_type, threshold=threshold, samples=samples, overlap=overlap, n_sources=n_sources, eps=eps)
+    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, mask_type='ibm', threshold=40, samples=32000, overlap=None, n_sources=2, compute_stft=True, compute_mask=True, eps=EPS):
+        super().__init__(wav_root, list_path, n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, mask_type=mask_type, threshold=threshold, samples=samples, overlap=overlap, n_sources=n_sources, compute_stft=compute_stft, compute_mask=compute_mask, eps=eps)
     
     def __getitem__(self, idx):
         """
@@ -261,58 +516,34 @@ class IdealMaskSpectrogramTrainDataset(IdealMaskSpectrogramDataset):
             ideal_mask (n_sources, n_bins, n_frames) <torch.Tensor>
             threshold_weight (1, n_bins, n_frames) <torch.Tensor>
         """
+        if not self.compute_mask:
+            mixture, sources, _, _ = super().__getitem__(idx)
+
+            return mixture, sources
+
         mixture, sources, ideal_mask, threshold_weight, _, _ = super().__getitem__(idx)
-        
+
         return mixture, sources, ideal_mask, threshold_weight
 
 class IdealMaskSpectrogramEvalDataset(IdealMaskSpectrogramDataset):
-    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, mask_type='ibm', threshold=40, max_samples=None, n_sources=2, eps=EPS):
-        super().__init__(wav_root, list_path, n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, mask_type=mask_type, threshold=threshold, n_sources=n_sources, eps=eps)
+    def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, mask_type='ibm', threshold=40, max_samples=None, n_sources=2, compute_stft=True, compute_mask=True, eps=EPS):
+        # Skip the SpectrogramDataset/WaveDataset chain: it would run the
+        # training-style segmentation scan only for the index to be rebuilt below.
+        WSJ0Dataset.__init__(self, wav_root, list_path)
+
+        self._set_stft_params(n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, compute_stft=compute_stft)
+        self._set_mask_params(mask_type, threshold=threshold, compute_mask=compute_mask, eps=eps)
 
         wav_root = os.path.abspath(wav_root)
         list_path = os.path.abspath(list_path)
 
-        self.json_data = []
+        cache_path = _metadata_cache_path(list_path, wav_root=wav_root, max_samples=max_samples, n_sources=n_sources)
         
-        with open(list_path) as f:
-            for line in f:
-                ID = line.strip()
-                wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
-                
-                wave, _ = torchaudio.load(wav_path)
-                
-                _, T_total = wave.size()
-                
-                if max_samples is None:
-                    samples = T_total
-                else:
-                    if T_total < max_samples:
-                        samples = T_total
-                    else:
-                        samples = max_samples
-                
-                data = {
-                    'sources': {},
-                    'mixture': {}
-                }
-                
-                for source_idx in range(n_sources):
-                    source_data = {
-                        'path': os.path.join('s{}'.format(source_idx + 1), '{}.wav'.format(ID)),
-                        'start': 0,
-                        'end': samples
-                    }
-                    data['sources']['s{}'.format(source_idx+1)] = source_data
-                
-                mixture_data = {
-                    'path': os.path.join('mix', '{}.wav'.format(ID)),
-                    'start': 0,
-                    'end': samples
-                }
-                data['mixture'] = mixture_data
-                data['ID'] = ID
-            
-                self.json_data.append(data)
+        if _load_metadata_cache(self, cache_path):
+            return
+
+        _build_full_utterance_index(self, wav_root, list_path, max_samples, n_sources=n_sources)
+        _save_metadata_cache(self, cache_path)
 
     def __getitem__(self, idx):
         """
@@ -322,58 +553,34 @@ class IdealMaskSpectrogramEvalDataset(IdealMaskSpectrogramDataset):
             ideal_mask (n_sources, n_bins, n_frames) <torch.Tensor>
             threshold_weight (1, n_bins, n_frames) <torch.Tensor>
         """
+        if not self.compute_mask:
+            mixture, sources, _, _ = super().__getitem__(idx)
+
+            return mixture, sources
+
         mixture, sources, ideal_mask, threshold_weight, _, _ = super().__getitem__(idx)
-    
+
         return mixture, sources, ideal_mask, threshold_weight
 
 class IdealMaskSpectrogramTestDataset(IdealMaskSpectrogramDataset):
     def __init__(self, wav_root, list_path, n_fft, hop_length=None, window_fn='hann', normalize=False, mask_type='ibm', threshold=40, max_samples=None, n_sources=2, eps=EPS):
-        super().__init__(wav_root, list_path, n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize, mask_type=mask_type, threshold=threshold, n_sources=n_sources, eps=eps)
+        # Skip the SpectrogramDataset/WaveDataset chain: it would run the
+        # training-style segmentation scan only for the index to be rebuilt below.
+        WSJ0Dataset.__init__(self, wav_root, list_path)
+
+        self._set_stft_params(n_fft, hop_length=hop_length, window_fn=window_fn, normalize=normalize)
+        self._set_mask_params(mask_type, threshold=threshold, eps=eps)
 
         wav_root = os.path.abspath(wav_root)
         list_path = os.path.abspath(list_path)
 
-        self.json_data = []
+        cache_path = _metadata_cache_path(list_path, wav_root=wav_root, max_samples=max_samples, n_sources=n_sources)
         
-        with open(list_path) as f:
-            for line in f:
-                ID = line.strip()
-                wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
-                
-                wave, _ = torchaudio.load(wav_path)
-                
-                _, T_total = wave.size()
-                
-                if max_samples is None:
-                    samples = T_total
-                else:
-                    if T_total < max_samples:
-                        samples = T_total
-                    else:
-                        samples = max_samples
-                
-                data = {
-                    'sources': {},
-                    'mixture': {}
-                }
-                
-                for source_idx in range(n_sources):
-                    source_data = {
-                        'path': os.path.join('s{}'.format(source_idx + 1), '{}.wav'.format(ID)),
-                        'start': 0,
-                        'end': samples
-                    }
-                    data['sources']['s{}'.format(source_idx+1)] = source_data
-                
-                mixture_data = {
-                    'path': os.path.join('mix', '{}.wav'.format(ID)),
-                    'start': 0,
-                    'end': samples
-                }
-                data['mixture'] = mixture_data
-                data['ID'] = ID
-            
-                self.json_data.append(data)
+        if _load_metadata_cache(self, cache_path):
+            return
+
+        _build_full_utterance_index(self, wav_root, list_path, max_samples, n_sources=n_sources)
+        _save_metadata_cache(self, cache_path)
 
     def __getitem__(self, idx):
         """
@@ -386,103 +593,141 @@ class IdealMaskSpectrogramTestDataset(IdealMaskSpectrogramDataset):
             segment_ID (n_sources,) <list<str>>
         """
         mixture, sources, ideal_mask, threshold_weight, T, _ = super().__getitem__(idx)
-        segment_ID = self.json_data[idx]['ID']
+        segment_ID = self.ids[idx]
 
         return mixture, sources, ideal_mask, threshold_weight, T, segment_ID
 
+class SegmentShuffleSampler(torch.utils.data.Sampler):
+    """
+    Shuffle at file granularity.
+    Segment indices belonging to the same utterance stay contiguous, so a
+    DataLoader worker slices every overlapping window out of one cached
+    decode (see `_read_wav_full`) instead of hopping between files and
+    evicting its cache on every sample.
+    """
+    def __init__(self, dataset, shuffle_in_file=True):
+        self.dataset = dataset
+        self.shuffle_in_file = shuffle_in_file
+
+    def __iter__(self):
+        indices_by_file = {}
+
+        for idx, ID in enumerate(self.dataset.ids):
+            indices_by_file.setdefault(ID, []).append(idx)
+
+        file_ids = list(indices_by_file.keys())
+        random.shuffle(file_ids)
+
+        for ID in file_ids:
+            indices = indices_by_file[ID]
+
+            if self.shuffle_in_file:
+                random.shuffle(indices)
+
+            yield from indices
+
+    def __len__(self):
+        return len(self.dataset)
+
 """
     Data loader
 """
 
+def _dl_worker_init(worker_id):
+    """
+    Keep each DataLoader worker single-threaded. The torch ops run inside
+    workers (STFT, mask generation) would otherwise each spin up a full
+    intra-op thread pool, oversubscribing the CPU num_workers-fold.
+    """
+    os.environ.setdefault('OMP_NUM_THREADS', '1')
+    torch.set_num_threads(1)
+
+def _set_default_loader_kwargs(kwargs):
+    # Pinned batches let the trainer issue asynchronous (non_blocking=True) H2D copies.
+    kwargs.setdefault('pin_memory', torch.cuda.is_available())
+    kwargs.setdefault('num_workers', (os.cpu_count() or 2) // 2)
+
+    if kwargs['num_workers'] > 0:
+        # Keep workers (and their waveform caches) alive across epochs, and let them decode ahead.
+        kwargs.setdefault('persistent_workers', True)
+        kwargs.setdefault('prefetch_factor', 4)
+        kwargs.setdefault('worker_init_fn', _dl_worker_init)
+
+    return kwargs
+
 class TrainDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
+        kwargs = _set_default_loader_kwargs(kwargs)
+
+        dataset = args[0] if args else kwargs.get('dataset')
+
+        if kwargs.get('shuffle') and kwargs.get('sampler') is None and getattr(dataset, 'ids', None):
+            # Shuffle at file granularity, so each worker slices its segments
+            # out of one cached decode (see SegmentShuffleSampler) instead of
+            # hopping between utterances. An explicit sampler (e.g.
+            # DistributedSampler) still wins.
+            kwargs['shuffle'] = False
+            kwargs['sampler'] = SegmentShuffleSampler(dataset)
+
         super().__init__(*args, **kwargs)
 
 class EvalDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__(*args, **_set_default_loader_kwargs(kwargs))
         
         assert self.batch_size == 1, "batch_size is expected 1, but given {}".format(self.batch_size)
 
 class TestDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__(*args, **_set_default_loader_kwargs(kwargs))
         
         assert self.batch_size == 1, "batch_size is expected 1, but given {}".format(self.batch_size)
         
         self.collate_fn = test_collate_fn
 
 def test_collate_fn(batch):
-    batched_mixture, batched_sources = [], []
-    batched_segment_ID = []
-    
-    for mixture, sources, segmend_ID in batch:
-        batched_mixture.append(mixture)
-        batched_sources.append(sources)
-        batched_segment_ID.append(segmend_ID)
+    batched_mixture, batched_sources, batched_segment_ID = zip(*batch)
     
     batched_mixture = torch.stack(batched_mixture, dim=0)
     batched_sources = torch.stack(batched_sources, dim=0)
     
-    return batched_mixture, batched_sources, batched_segment_ID
+    return batched_mixture, batched_sources, list(batched_segment_ID)
 
 class IdealMaskSpectrogramTestDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__(*args, **_set_default_loader_kwargs(kwargs))
         
         assert self.batch_size == 1, "batch_size is expected 1, but given {}".format(self.batch_size)
         
         self.collate_fn = ideal_mask_spectrogram_test_collate_fn
 
 def ideal_mask_spectrogram_test_collate_fn(batch):
-    batched_mixture, batched_sources, batched_ideal_mask, batched_weight_threshold = [], [], [], []
-    batched_T = []
-    batched_segment_ID = []
-
-    for mixture, sources, ideal_mask, weight_threshold, T, segmend_ID in batch:
-        batched_mixture.append(mixture)
-        batched_sources.append(sources)
-        batched_ideal_mask.append(ideal_mask)
-        batched_weight_threshold.append(weight_threshold)
-
-        batched_T.append(T)
-        batched_segment_ID.append(segmend_ID)
+    batched_mixture, batched_sources, batched_ideal_mask, batched_weight_threshold, batched_T, batched_segment_ID = zip(*batch)
     
     batched_mixture = torch.stack(batched_mixture, dim=0)
     batched_sources = torch.stack(batched_sources, dim=0)
     batched_ideal_mask = torch.stack(batched_ideal_mask, dim=0)
     batched_weight_threshold = torch.stack(batched_weight_threshold, dim=0)
     
-    return batched_mixture, batched_sources, batched_ideal_mask, batched_weight_threshold, batched_T, batched_segment_ID
+    return batched_mixture, batched_sources, batched_ideal_mask, batched_weight_threshold, list(batched_T), list(batched_segment_ID)
 
 class AttractorTestDataLoader(torch.utils.data.DataLoader):
     def __init__(self, *args, **kwargs):
-        super().__init__(*args, **kwargs)
+        super().__init__(*args, **_set_default_loader_kwargs(kwargs))
         
         assert self.batch_size == 1, "batch_size is expected 1, but given {}".format(self.batch_size)
         
         self.collate_fn = attractor_test_collate_fn
 
 def attractor_test_collate_fn(batch):
-    batched_mixture, batched_sources, batched_assignment, batched_weight_threshold = [], [], [], []
-    batched_T = []
-    batched_segment_ID = []
-    
-    for mixture, sources, assignment, weight_threshold, T, segmend_ID in batch:
-        batched_mixture.append(mixture)
-        batched_sources.append(sources)
-        batched_assignment.append(assignment)
-        batched_weight_threshold.append(weight_threshold)
-
-        batched_T.append(T)
-        batched_segment_ID.append(segmend_ID)
+    batched_mixture, batched_sources, batched_assignment, batched_weight_threshold, batched_T, batched_segment_ID = zip(*batch)
     
     batched_mixture = torch.stack(batched_mixture, dim=0)
     batched_sources = torch.stack(batched_sources, dim=0)
     batched_assignment = torch.stack(batched_assignment, dim=0)
     batched_weight_threshold = torch.stack(batched_weight_threshold, dim=0)
     
-    return batched_mixture, batched_sources, batched_assignment, batched_weight_threshold, batched_T, batched_segment_ID
+    return batched_mixture, batched_sources, batched_assignment, batched_weight_threshold, list(batched_T), list(batched_segment_ID)
 
 """
 Dataset for unknown number of sources.
@@ -497,51 +742,45 @@ class MixedNumberSourcesWaveDataset(WSJ0Dataset):
         if overlap is None:
             overlap = samples//2
         
-        self.json_data = []
+        cache_path = _metadata_cache_path(list_path, wav_root=wav_root, samples=samples, overlap=overlap, max_n_sources=max_n_sources)
+        
+        if _load_metadata_cache(self, cache_path):
+            return
+        
+        ids, starts, source_paths = [], [], []
+        source_id_sets = _list_source_ids(wav_root, max_n_sources)
+        
+        _prefetch_wav_info(wav_root, list_path)
         
         with open(list_path) as f:
             for line in f:
                 ID = line.strip()
                 wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
                 
-                wave, _ = torchaudio.load(wav_path)
-                _, T_total = wave.size()
+                T_total, _ = read_wav_info(wav_path)
 
                 n_sources = 0
 
                 for source_idx in range(max_n_sources):
-                    wav_path = os.path.join(wav_root, 's{}'.format(source_idx+1), '{}.wav'.format(ID))
-                    if not os.path.exists(wav_path):
+                    if '{}.wav'.format(ID) not in source_id_sets[source_idx]:
                         break
                     n_sources += 1
                 
-                for start_idx in range(0, T_total, samples - overlap):
-                    end_idx = start_idx + samples
-                    if end_idx > T_total:
-                        break
-                    data = {
-                        'sources': {},
-                        'mixture': {}
-                    }
-                    
-                    for source_idx in range(n_sources):
-                        source_data = {
-                            'path': os.path.join('s{}'.format(source_idx+1), '{}.wav'.format(ID)),
-                            'start': start_idx,
-                            'end': end_idx
-                        }
-                        data['sources']['s{}'.format(source_idx+1)] = source_data
-                    
-                    mixture_data = {
-                        'path': os.path.join('mix', '{}.wav'.format(ID)),
-                        'start': start_idx,
-                        'end': end_idx
-                    }
-                    data['mixture'] = mixture_data
-                    data['ID'] = ID
+                track_starts = _enumerate_segments(T_total, samples, overlap)
+                track_source_paths = [os.path.join(wav_root, 's{}'.format(source_idx+1), '{}.wav'.format(ID)) for source_idx in range(n_sources)]
                 
-                    self.json_data.append(data)
+                ids.extend([ID] * len(track_starts))
+                starts.append(track_starts)
+                source_paths.extend([track_source_paths] * len(track_starts))
+        
+        self.ids = ids
+        self.starts = np.concatenate(starts) if starts else np.zeros(0, dtype=np.int32)
+        self.ends = self.starts + samples
+        self.mixture_paths = [os.path.join(wav_root, 'mix', '{}.wav'.format(ID)) for ID in ids]
+        self.source_paths = source_paths
         
+        _save_metadata_cache(self, cache_path)
+
     def __getitem__(self, idx):
         """
         Returns:
@@ -549,29 +788,26 @@ class MixedNumberSourcesWaveDataset(WSJ0Dataset):
             sources (n_sources, T) <torch.Tensor>
             segment_ID <str>
         """
-        data = self.json_data[idx]
-        sources = []
-        
-        for key in data['sources'].keys():
-            source_data = data['sources'][key]
-            start, end = source_data['start'], source_data['end']
-            wav_path = os.path.join(self.wav_root, source_data['path'])
-            wave, _ = torchaudio.load(wav_path, frame_offset=start, num_frames=end-start)
-            sources.append(wave)
-        
-        sources = torch.cat(sources, dim=0)
-        
-        mixture_data = data['mixture']
-        start, end = mixture_data['start'], mixture_data['end']
-        wav_path = os.path.join(self.wav_root, mixture_data['path'])
-        mixture, _ = torchaudio.load(wav_path, frame_offset=start, num_frames=end-start)
+        # Unbox the int32 entries once; everything below slices with plain ints.
+        start, end = int(self.starts[idx]), int(self.ends[idx])
+        source_paths = self.source_paths[idx]
+        
+        # Preallocated output; each source is copied straight into its row
+        # through the shared-storage numpy view.
+        sources = torch.empty(len(source_paths), end - start, dtype=torch.float32)
+        sources_view = sources.numpy()
+        
+        for source_idx, source_path in enumerate(source_paths):
+            _read_wav_segment(source_path, start, end, out=sources_view[source_idx])
+        
+        mixture = _read_wav_segment(self.mixture_paths[idx], start, end)
             
-        segment_ID = self.json_data[idx]['ID'] + '_{}-{}'.format(start, end)
+        segment_ID = self.ids[idx] + '_{}-{}'.format(start, end)
         
         return mixture, sources, segment_ID
         
     def __len__(self):
-        return len(self.json_data)
+        return len(self.starts)
 
 class MixedNumberSourcesWaveTrainDataset(MixedNumberSourcesWaveDataset):
     def __init__(self, wav_root, list_path, samples=32000, overlap=None, max_n_sources=2):
@@ -584,63 +820,25 @@ class MixedNumberSourcesWaveTrainDataset(MixedNumberSourcesWaveDataset):
 
 class MixedNumberSourcesWaveEvalDataset(MixedNumberSourcesWaveDataset):
     def __init__(self, wav_root, list_path, max_samples=None, max_n_sources=3):
-        super().__init__(wav_root, list_path, max_n_sources=max_n_sources)
+        # Skip MixedNumberSourcesWaveDataset.__init__ (see WaveEvalDataset).
+        WSJ0Dataset.__init__(self, wav_root, list_path)
 
         wav_root = os.path.abspath(wav_root)
         list_path = os.path.abspath(list_path)
 
-        self.json_data = []
+        cache_path = _metadata_cache_path(list_path, wav_root=wav_root, max_samples=max_samples, max_n_sources=max_n_sources)
         
-        with open(list_path) as f:
-            for line in f:
-                ID = line.strip()
-                wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
-                
-                wave, _ = torchaudio.load(wav_path)
-                _, T_total = wave.size()
-                
-                if max_samples is None:
-                    samples = T_total
-                else:
-                    if T_total < max_samples:
-                        samples = T_total
-                    else:
-                        samples = max_samples
-                
-                n_sources = 0
+        if _load_metadata_cache(self, cache_path):
+            return
+
+        source_id_sets = _list_source_ids(wav_root, max_n_sources)
+        
+        _build_full_utterance_index(self, wav_root, list_path, max_samples, source_id_sets=source_id_sets)
+        _save_metadata_cache(self, cache_path)
 
-                for source_idx in range(max_n_sources):
-                    wav_path = os.path.join(wav_root, 's{}'.format(source_idx+1), '{}.wav'.format(ID))
-                    if not os.path.exists(wav_path):
-                        break
-                    n_sources += 1
-                
-                data = {
-                    'sources': {},
-                    'mixture': {}
-                }
-                
-                for source_idx in range(n_sources):
-                    source_data = {
-                        'path': os.path.join('s{}'.format(source_idx+1), '{}.wav'.format(ID)),
-                        'start': 0,
-                        'end': samples
-                    }
-                    data['sources']['s{}'.format(source_idx+1)] = source_data
-                
-                mixture_data = {
-                    'path': os.path.join('mix', '{}.wav'.format(ID)),
-                    'start': 0,
-                    'end': samples
-                }
-                data['mixture'] = mixture_data
-                data['ID'] = ID
-            
-                self.json_data.append(data)
-    
     def __getitem__(self, idx):
         mixture, sources, _ = super().__getitem__(idx)
-        segment_ID = self.json_data[idx]['ID']
+        segment_ID = self.ids[idx]
     
         return mixture, sources, segment_ID
 
@@ -656,31 +854,40 @@ class MixedNumberSourcesEvalDataLoader(EvalDataLoader):
         
         self.collate_fn = mixed_number_sources_eval_collate_fn
 
+def _pad_mixed_number_sources(batched_mixture, batched_sources):
+    """
+    Pad mixtures and sources into two preallocated zero buffers.
+    n_sources is different from data to data. A padded tensor plus a length
+    vector avoids the sort and metadata of pack_sequence, and slice
+    assignment into one buffer avoids pad_sequence's per-item handling.
+    """
+    batched_n_sources = torch.tensor([sources.size(0) for sources in batched_sources], dtype=torch.long)
+
+    max_T = max(mixture.size(-1) for mixture in batched_mixture)
+    max_n_sources = max(sources.size(0) for sources in batched_sources)
+
+    padded_mixture = torch.zeros(len(batched_mixture), 1, max_T, dtype=batched_mixture[0].dtype)
+    padded_sources = torch.zeros(len(batched_sources), max_n_sources, max_T, dtype=batched_sources[0].dtype)
+
+    for idx, (mixture, sources) in enumerate(zip(batched_mixture, batched_sources)):
+        padded_mixture[idx, :, :mixture.size(-1)] = mixture
+        padded_sources[idx, :sources.size(0), :sources.size(-1)] = sources
+
+    return padded_mixture, padded_sources, batched_n_sources
+
 def mixed_number_sources_train_collate_fn(batch):
-    batched_mixture, batched_sources = [], []
+    batched_mixture, batched_sources = zip(*batch)
 
-    for mixture, sources in batch:
-        batched_mixture.append(mixture)
-        batched_sources.append(sources)
+    batched_mixture, batched_sources, batched_n_sources = _pad_mixed_number_sources(batched_mixture, batched_sources)
 
-    batched_mixture = nn.utils.rnn.pad_sequence(batched_mixture, batch_first=True)
-    batched_sources = nn.utils.rnn.pack_sequence(batched_sources, enforce_sorted=False) # n_sources is different from data to data
-    
-    return batched_mixture, batched_sources
+    return batched_mixture, batched_sources, batched_n_sources
 
 def mixed_number_sources_eval_collate_fn(batch):
-    batched_mixture, batched_sources, segment_ID = [], [], []
-    batched_segment_ID = []
+    batched_mixture, batched_sources, batched_segment_ID = zip(*batch)
 
-    for mixture, sources, segment_ID in batch:
-        batched_mixture.append(mixture)
-        batched_sources.append(sources)
-        batched_segment_ID.append(segment_ID)
+    batched_mixture, batched_sources, batched_n_sources = _pad_mixed_number_sources(batched_mixture, batched_sources)
 
-    batched_mixture = nn.utils.rnn.pad_sequence(batched_mixture, batch_first=True)
-    batched_sources = nn.utils.rnn.pack_sequence(batched_sources, enforce_sorted=False) # n_sources is different from data to data
-    
-    return batched_mixture, batched_sources, batched_segment_ID
+    return batched_mixture, batched_sources, batched_n_sources, list(batched_segment_ID)
 
 if __name__ == '__main__':
     torch.manual_seed(111)
@@ -3,10 +3,13 @@ import shutil
 import subprocess
 import time
 import uuid
+from concurrent.futures import ThreadPoolExecutor
 
 import torch
 import torchaudio
 import torch.nn as nn
+import torch.distributed as dist
+from torch.utils.data.distributed import DistributedSampler
 
 from utils.utils import draw_loss_curve
 from utils.bss import bss_eval_sources
@@ -16,6 +19,80 @@ from criterion.pit import pit
 
 BITS_PER_SAMPLE_WSJ0 = 16
 MIN_PESQ = -0.5
+EPS = 1e-12
+
+def _snapshot_to_cpu(obj):
+    """
+    Deep-copy a checkpoint structure onto the CPU, so it can be pickled on a
+    background thread while training keeps mutating the live tensors.
+    """
+    if torch.is_tensor(obj):
+        return obj.detach().to('cpu', copy=True)
+    if isinstance(obj, dict):
+        return {key: _snapshot_to_cpu(value) for key, value in obj.items()}
+    if isinstance(obj, list):
+        return [_snapshot_to_cpu(value) for value in obj]
+
+    return obj
+
+class CudaPrefetcher:
+    """
+    Wrap a DataLoader and copy each batch to the GPU on a side CUDA stream one
+    iteration ahead, so the H2D transfer overlaps the current step's compute.
+    Tensors already on the device pass through the trainers' .cuda() calls
+    unchanged.
+    """
+    def __init__(self, loader):
+        self.loader = loader
+        self.stream = torch.cuda.Stream()
+        self.next_batch = None
+
+    @property
+    def dataset(self):
+        return self.loader.dataset
+
+    @property
+    def sampler(self):
+        return self.loader.sampler
+
+    def __len__(self):
+        return len(self.loader)
+
+    def __iter__(self):
+        self._iterator = iter(self.loader)
+        self._preload()
+
+        return self
+
+    def _preload(self):
+        try:
+            batch = next(self._iterator)
+        except StopIteration:
+            self.next_batch = None
+            return
+
+        with torch.cuda.stream(self.stream):
+            self.next_batch = tuple(
+                item.cuda(non_blocking=True) if isinstance(item, torch.Tensor) else item
+                for item in batch
+            )
+
+    def __next__(self):
+        if self.next_batch is None:
+            raise StopIteration
+
+        torch.cuda.current_stream().wait_stream(self.stream)
+        batch = self.next_batch
+
+        for item in batch:
+            if isinstance(item, torch.Tensor):
+                # Keep the allocator from recycling the side-stream copy while
+                # the compute stream still reads it.
+                item.record_stream(torch.cuda.current_stream())
+
+        self._preload()
+
+        return batch
 
 class TrainerBase:
     def __init__(self, model, loader, pit_criterion, optimizer, args):
@@ -48,6 +125,34 @@ class TrainerBase:
 
         self.use_cuda = args.use_cuda
 
+        # Under torchrun, only rank 0 saves checkpoints and sample WAVs;
+        # single-process runs are always the main process.
+        self.is_main_process = not (dist.is_available() and dist.is_initialized()) or dist.get_rank() == 0
+
+        # Sample WAVs are written from a background pool, so the eval loop
+        # does not block on disk I/O between batches.
+        self._io_pool = ThreadPoolExecutor(max_workers=2)
+
+        # Render the loss curve every `plot_every` epochs only.
+        if hasattr(args, 'plot_every'):
+            self.plot_every = args.plot_every
+        else:
+            self.plot_every = 10
+
+        # Write "last.pth" every `ckpt_every` epochs only; "best.pth" is
+        # always written on improvement.
+        if hasattr(args, 'ckpt_every'):
+            self.ckpt_every = args.ckpt_every
+        else:
+            self.ckpt_every = 5
+
+        self._save_future = None
+
+        if self.use_cuda and torch.cuda.is_available():
+            # Stage the next batch's H2D copy on a side stream while the
+            # current step computes.
+            self.train_loader = CudaPrefetcher(self.train_loader)
+
         if args.continue_from:
             config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
 
@@ -60,7 +165,7 @@ class TrainerBase:
             self.prev_loss = self.valid_loss[self.start_epoch - 1]
             self.no_improvement = config['no_improvement']
 
-            if isinstance(self.model, nn.DataParallel):
+            if isinstance(self.model, (nn.DataParallel, nn.parallel.DistributedDataParallel)):
                 self.model.module.load_state_dict(config['state_dict'])
             else:
                 self.model.load_state_dict(config['state_dict'])
@@ -82,7 +187,14 @@ class TrainerBase:
             self.no_improvement = 0
 
     def run(self):
+        sampler = getattr(self.train_loader, 'sampler', None)
+
         for epoch in range(self.start_epoch, self.epochs):
+            if isinstance(sampler, DistributedSampler):
+                # Reseed the per-rank shuffle; left alone, every epoch replays
+                # the same batch order.
+                sampler.set_epoch(epoch)
+
             start = time.time()
             train_loss, valid_loss = self.run_one_epoch(epoch)
             end = time.time()
@@ -92,11 +204,14 @@ class TrainerBase:
             self.train_loss[epoch] = train_loss
             self.valid_loss[epoch] = valid_loss
 
-            if valid_loss < self.best_loss:
+            is_best = valid_loss < self.best_loss
+
+            if is_best:
                 self.best_loss = valid_loss
                 self.no_improvement = 0
-                model_path = os.path.join(self.model_dir, "best.pth")
-                self.save_model(epoch, model_path)
+                if self.is_main_process:
+                    model_path = os.path.join(self.model_dir, "best.pth")
+                    self.save_model(epoch, model_path)
             else:
                 if valid_loss >= self.prev_loss:
                     self.no_improvement += 1
@@ -114,11 +229,19 @@ class TrainerBase:
 
             self.prev_loss = valid_loss
 
-            model_path = os.path.join(self.model_dir, "last.pth")
-            self.save_model(epoch, model_path)
+            if self.is_main_process:
+                if (epoch + 1) % self.ckpt_every == 0 or epoch + 1 == self.epochs:
+                    model_path = os.path.join(self.model_dir, "last.pth")
+                    self.save_model(epoch, model_path)
+
+                if (epoch + 1) % self.plot_every == 0 or is_best:
+                    save_path = os.path.join(self.loss_dir, "loss.png")
+                    # Cloned slices, so matplotlib renders on the I/O pool while
+                    # the next epoch overwrites the loss buffers.
+                    self._io_pool.submit(draw_loss_curve, train_loss=self.train_loss[:epoch + 1].clone(), valid_loss=self.valid_loss[:epoch + 1].clone(), save_path=save_path)
 
-            save_path = os.path.join(self.loss_dir, "loss.png")
-            draw_loss_curve(train_loss=self.train_loss[:epoch + 1], valid_loss=self.valid_loss[:epoch + 1], save_path=save_path)
+        if self._save_future is not None:
+            self._save_future.result()
     
     def run_one_epoch(self, epoch):
         """
@@ -135,18 +258,19 @@ class TrainerBase:
         """
         self.model.train()
 
-        train_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        train_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_train_batch = len(self.train_loader)
 
         for idx, (mixture, sources) in enumerate(self.train_loader):
             if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
 
             estimated_sources = self.model(mixture)
             loss, _ = self.pit_criterion(estimated_sources, sources)
 
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
 
             if self.max_norm:
@@ -154,12 +278,12 @@ class TrainerBase:
 
             self.optimizer.step()
 
-            train_loss += loss.item()
+            train_loss += loss.detach()
 
             if (idx + 1) % 100 == 0:
                 print("[Epoch {}/{}] iter {}/{} loss: {:.5f}".format(epoch + 1, self.epochs, idx + 1, n_train_batch, loss.item()), flush=True)
 
-        train_loss /= n_train_batch
+        train_loss = train_loss.item() / n_train_batch
 
         return train_loss
 
@@ -169,44 +293,53 @@ class TrainerBase:
         """
         self.model.eval()
         
-        valid_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
-        
-        with torch.no_grad():
+
+        futures = []
+
+        with torch.inference_mode():
             for idx, (mixture, sources, segment_IDs) in enumerate(self.valid_loader):
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
                 output = self.model(mixture)
                 loss, _ = self.pit_criterion(output, sources, batch_mean=False)
                 loss = loss.sum(dim=0)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
                 
-                if idx < 5:
-                    mixture = mixture[0].squeeze(dim=0).cpu()
-                    estimated_sources = output[0].cpu()
-                    
+                if self.is_main_process and idx < 5:
+                    mixture = mixture[0].squeeze(dim=0)
+                    estimated_sources = output[0]
+
+                    # Normalize on device before the D2H copy; `amax` is a single fused reduction.
+                    mixture = mixture / torch.abs(mixture).amax().clamp_min(EPS)
+                    norm = torch.abs(estimated_sources).amax(dim=-1, keepdim=True).clamp_min(EPS)
+                    estimated_sources = estimated_sources / norm
+
+                    mixture, estimated_sources = mixture.cpu(), estimated_sources.cpu()
+
                     save_dir = os.path.join(self.sample_dir, segment_IDs[0])
                     os.makedirs(save_dir, exist_ok=True)
                     save_path = os.path.join(save_dir, "mixture.wav")
-                    norm = torch.abs(mixture).max()
-                    mixture = mixture / norm
                     signal = mixture.unsqueeze(dim=0) if mixture.dim() == 1 else mixture
-                    torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0))
                     
                     for source_idx, estimated_source in enumerate(estimated_sources):
                         save_path = os.path.join(save_dir, "epoch{}-{}.wav".format(epoch + 1, source_idx + 1))
-                        norm = torch.abs(estimated_source).max()
-                        estimated_source = estimated_source / norm
                         signal = estimated_source.unsqueeze(dim=0) if estimated_source.dim() == 1 else estimated_source
-                        torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0)
-        
-        valid_loss /= n_valid
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0))
+
+        for future in futures:
+            future.result()
+
+        valid_loss = valid_loss.item() / n_valid
         
         return valid_loss
 
     def save_model(self, epoch, model_path='./tmp.pth'):
-        if isinstance(self.model, nn.DataParallel):
+        if isinstance(self.model, (nn.DataParallel, nn.parallel.DistributedDataParallel)):
             config = self.model.module.get_config()
             config['state_dict'] = self.model.module.state_dict()
         else:
@@ -223,7 +356,14 @@ class TrainerBase:
 
         config['epoch'] = epoch + 1
 
-        torch.save(config, model_path)
+        # Immutable CPU snapshot; the pickle then runs on the I/O pool instead
+        # of stalling the training thread.
+        config = _snapshot_to_cpu(config)
+
+        if self._save_future is not None:
+            self._save_future.result()
+
+        self._save_future = self._io_pool.submit(torch.save, config, model_path)
 
 class TesterBase:
     def __init__(self, model, loader, pit_criterion, args):
@@ -277,8 +417,8 @@ class TesterBase:
         with torch.no_grad():
             for idx, (mixture, sources, segment_IDs) in enumerate(self.loader):
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
 
                 output = self.model(mixture)
 
@@ -428,23 +568,24 @@ class AttractorTrainer(TrainerBase):
         """
         self.model.train()
 
-        train_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        train_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_train_batch = len(self.train_loader)
 
         for idx, (mixture, sources, assignment, threshold_weight) in enumerate(self.train_loader):
             if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
-                assignment = assignment.cuda()
-                threshold_weight = threshold_weight.cuda()
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
+                assignment = assignment.cuda(non_blocking=True)
+                threshold_weight = threshold_weight.cuda(non_blocking=True)
 
             mixture_amplitude = torch.abs(mixture)
             sources_amplitude = torch.abs(sources)
 
-            estimated_sources_amplitude = self.model(mixture_amplitude, assignment=assignment, threshold_weight=threshold_weight, n_sources=sources.size(1))
+            estimated_sources_amplitude = self.model(mixture_amplitude, assignment=assignment, threshold_weight=threshold_weight, n_sources=self.n_sources)
             loss = self.criterion(estimated_sources_amplitude, sources_amplitude)
 
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
 
             if self.max_norm:
@@ -452,12 +593,12 @@ class AttractorTrainer(TrainerBase):
 
             self.optimizer.step()
 
-            train_loss += loss.item()
+            train_loss += loss.detach()
 
             if (idx + 1) % 100 == 0:
                 print("[Epoch {}/{}] iter {}/{} loss: {:.5f}".format(epoch + 1, self.epochs, idx + 1, n_train_batch, loss.item()), flush=True)
 
-        train_loss /= n_train_batch
+        train_loss = train_loss.item() / n_train_batch
 
         return train_loss
 
@@ -470,10 +611,13 @@ class AttractorTrainer(TrainerBase):
 
         self.model.eval()
 
-        valid_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
 
-        with torch.no_grad():
+        futures = []
+
+        with torch.inference_mode():
             for idx, (mixture, sources, assignment, threshold_weight) in enumerate(self.valid_loader):
                 """
                 mixture (batch_size, 1, n_bins, n_frames)
@@ -482,10 +626,10 @@ class AttractorTrainer(TrainerBase):
                 threshold_weight (batch_size, n_bins, n_frames)
                 """
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
-                    threshold_weight = threshold_weight.cuda()
-                    assignment = assignment.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
+                    threshold_weight = threshold_weight.cuda(non_blocking=True)
+                    assignment = assignment.cuda(non_blocking=True)
 
                 mixture_amplitude = torch.abs(mixture)
                 sources_amplitude = torch.abs(sources)
@@ -494,9 +638,9 @@ class AttractorTrainer(TrainerBase):
                 # At the test phase, assignment may be unknown.
                 loss, _ = pit(self.criterion, output, sources_amplitude, batch_mean=False)
                 loss = loss.sum(dim=0)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
 
-                if idx < 5:
+                if self.is_main_process and idx < 5:
                     mixture = mixture[0].cpu() # (1, n_bins, n_frames)
                     mixture_amplitude = mixture_amplitude[0].cpu() # (1, n_bins, n_frames)
                     estimated_sources_amplitude = output[0].cpu() # (n_sources, n_bins, n_frames)
@@ -508,22 +652,27 @@ class AttractorTrainer(TrainerBase):
                     mixture = istft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, normalized=self.normalize, window=self.window) # (1, T)
                     mixture = mixture.squeeze(dim=0) # (T,)
 
+                    # One vectorized normalization per dump instead of a max scan
+                    # and divide per file.
+                    mixture = mixture / torch.abs(mixture).amax().clamp_min(EPS)
+                    norm = torch.abs(estimated_sources).amax(dim=-1, keepdim=True).clamp_min(EPS)
+                    estimated_sources = estimated_sources / norm
+
                     save_dir = os.path.join(self.sample_dir, "{}".format(idx + 1))
                     os.makedirs(save_dir, exist_ok=True)
                     save_path = os.path.join(save_dir, "mixture.wav")
-                    norm = torch.abs(mixture).max()
-                    mixture = mixture / norm
                     signal = mixture.unsqueeze(dim=0) if mixture.dim() == 1 else mixture
-                    torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0)
+                    futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0))
 
                     for source_idx, estimated_source in enumerate(estimated_sources):
                         save_path = os.path.join(save_dir, "epoch{}-{}.wav".format(epoch + 1,source_idx + 1))
-                        norm = torch.abs(estimated_source).max()
-                        estimated_source = estimated_source / norm
                         signal = estimated_source.unsqueeze(dim=0) if estimated_source.dim() == 1 else estimated_source
-                        torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0)
+                        futures.append(self._io_pool.submit(torchaudio.save, save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0))
+
+        for future in futures:
+            future.result()
 
-        valid_loss /= n_valid
+        valid_loss = valid_loss.item() / n_valid
 
         return valid_loss
 
@@ -579,10 +728,10 @@ class AttractorTester(TesterBase):
                     T (1,)
                 """
                 if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
-                    ideal_mask = ideal_mask.cuda()
-                    threshold_weight = threshold_weight.cuda()
+                    mixture = mixture.cuda(non_blocking=True)
+                    sources = sources.cuda(non_blocking=True)
+                    ideal_mask = ideal_mask.cuda(non_blocking=True)
+                    threshold_weight = threshold_weight.cuda(non_blocking=True)
 
                 mixture_amplitude = torch.abs(mixture) # -> (1, 1, n_bins, n_frames)
                 sources_amplitude = torch.abs(sources)
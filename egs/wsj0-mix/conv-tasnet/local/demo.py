@@ -67,7 +67,7 @@ def process_offline(sample_rate, num_chunk, duration=5, model_path=None, save_di
     print("Start separation...")
 
     with torch.no_grad():
-        mixture = torch.Tensor(signal).float()
+        mixture = torch.from_numpy(signal.astype(np.float32))
         mixture = mixture.unsqueeze(dim=0).unsqueeze(dim=0)
         estimated_sources = model(mixture)
         estimated_sources = estimated_sources.squeeze(dim=0).detach().cpu().numpy()
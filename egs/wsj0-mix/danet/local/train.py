@@ -35,6 +35,7 @@ parser.add_argument('--dropout', type=float, default=0, help='Dropout rate of LS
 parser.add_argument('--causal', type=int, default=0, help='Causality')
 parser.add_argument('--mask_nonlinear', type=str, default='sigmoid', help='Non-linear function of mask estiamtion')
 parser.add_argument('--iter_clustering', type=int, default=-1, help='# iterations when clustering')
+parser.add_argument('--device_preprocessing', type=int, default=0, help='0: Compute STFT and ideal mask per sample in DataLoader workers, 1: Defer them to the trainer, batched on the device')
 parser.add_argument('--take_log', type=int, default=1, help='Whether to apply log for input.')
 parser.add_argument('--take_db', type=int, default=0, help='Whether to apply 20*log10 for input.')
 parser.add_argument('--n_sources', type=int, default=None, help='# speakers')
@@ -51,6 +52,7 @@ parser.add_argument('--loss_dir', type=str, default='./tmp/loss', help='Loss dir
 parser.add_argument('--sample_dir', type=str, default='./tmp/sample', help='Sample directory')
 parser.add_argument('--continue_from', type=str, default=None, help='Resume training')
 parser.add_argument('--use_cuda', type=int, default=1, help='0: Not use cuda, 1: Use cuda')
+parser.add_argument('--use_amp', type=int, default=0, help='0: Not use automatic mixed precision, 1: Use automatic mixed precision')
 parser.add_argument('--overwrite', type=int, default=0, help='0: NOT overwrite, 1: FORCE overwrite')
 parser.add_argument('--seed', type=int, default=42, help='Random seed')
 
@@ -62,13 +64,17 @@ def main(args):
 
     loader = {}
 
-    train_dataset = IdealMaskSpectrogramTrainDataset(args.train_wav_root, args.train_list_path, n_fft=args.n_fft, hop_length=args.hop_length, window_fn=args.window_fn, mask_type=args.ideal_mask, threshold=args.threshold, samples=samples, overlap=overlap, n_sources=args.n_sources)
+    # With --device_preprocessing the datasets return raw waveforms and the
+    # trainer runs one batched STFT and mask generation on the device.
+    compute_in_workers = not args.device_preprocessing
+
+    train_dataset = IdealMaskSpectrogramTrainDataset(args.train_wav_root, args.train_list_path, n_fft=args.n_fft, hop_length=args.hop_length, window_fn=args.window_fn, mask_type=args.ideal_mask, threshold=args.threshold, samples=samples, overlap=overlap, n_sources=args.n_sources, compute_stft=compute_in_workers, compute_mask=compute_in_workers)
     loader['train'] = TrainDataLoader(train_dataset, batch_size=args.batch_size, shuffle=True)
     print("Training dataset includes {} samples.".format(len(train_dataset)))
 
     if args.valid_duration > 0:
         max_samples = int(args.sample_rate * args.valid_duration)
-        valid_dataset = IdealMaskSpectrogramEvalDataset(args.valid_wav_root, args.valid_list_path, n_fft=args.n_fft, hop_length=args.hop_length, window_fn=args.window_fn, mask_type=args.ideal_mask, threshold=args.threshold, max_samples=max_samples, n_sources=args.n_sources)
+        valid_dataset = IdealMaskSpectrogramEvalDataset(args.valid_wav_root, args.valid_list_path, n_fft=args.n_fft, hop_length=args.hop_length, window_fn=args.window_fn, mask_type=args.ideal_mask, threshold=args.threshold, max_samples=max_samples, n_sources=args.n_sources, compute_stft=compute_in_workers, compute_mask=compute_in_workers)
         loader['valid'] = EvalDataLoader(valid_dataset, batch_size=1, shuffle=False)
         print("Valid dataset includes {} samples.".format(len(valid_dataset)))
     else:
@@ -12,13 +12,15 @@ import torch.nn as nn
 from utils.utils import draw_loss_curve
 from utils.bss import bss_eval_sources
 from algorithm.clustering import KMeans
-from transforms.stft import istft
-from driver import TrainerBase, TesterBase
+from transforms.stft import stft, istft
+from dataset import compute_ideal_mask_and_threshold_weight
+from driver import CudaPrefetcher, TrainerBase, TesterBase
 from criterion.pit import pit
 
 BITS_PER_SAMPLE_WSJ0 = 16
 MIN_PESQ = -0.5
 NO_IMPROVEMENT = 10
+EPS = 1e-12
 
 class AdhocTrainer(TrainerBase):
     def __init__(self, model, loader, criterion, optimizer, scheduler, args):
@@ -49,6 +51,18 @@ class AdhocTrainer(TrainerBase):
 
         self.use_cuda = args.use_cuda
 
+        if hasattr(args, 'use_amp'):
+            self.use_amp = args.use_amp and args.use_cuda
+        else:
+            self.use_amp = False
+
+        self.scaler = torch.cuda.amp.GradScaler(enabled=self.use_amp)
+
+        if self.use_cuda and torch.cuda.is_available():
+            # Stage the next batch's H2D copy on a side stream while the
+            # current step computes.
+            self.train_loader = CudaPrefetcher(self.train_loader)
+
         if args.continue_from:
             config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
 
@@ -87,9 +101,56 @@ class AdhocTrainer(TrainerBase):
         self.window = self.train_loader.dataset.window
         self.normalize = self.train_loader.dataset.normalize
 
+        if self.use_cuda and self.window is not None:
+            # Device-resident copy for the deferred STFT path, so the window
+            # is not re-uploaded on every batch.
+            self.device_window = self.window.cuda()
+        else:
+            self.device_window = self.window
+
         self.target_type = args.target_type
         self.iter_clustering = args.iter_clustering
 
+    def _prepare_batch(self, batch, dataset):
+        """
+        Move one batch to the device. For datasets built with
+        compute_stft=False and compute_mask=False the batch holds raw
+        waveforms; the STFT and ideal mask are then computed here, once per
+        batch on the device, instead of per sample in the CPU workers.
+        Returns:
+            mixture (batch_size, 1, n_bins, n_frames) <torch.Tensor>
+            sources (batch_size, n_sources, n_bins, n_frames) <torch.Tensor>
+            ideal_mask (batch_size, n_sources, n_bins, n_frames) <torch.Tensor>
+            threshold_weight (batch_size, 1, n_bins, n_frames) <torch.Tensor>
+        """
+        if len(batch) == 4:
+            mixture, sources, ideal_mask, threshold_weight = batch
+
+            if self.use_cuda:
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
+                ideal_mask = ideal_mask.cuda(non_blocking=True)
+                threshold_weight = threshold_weight.cuda(non_blocking=True)
+
+            return mixture, sources, ideal_mask, threshold_weight
+
+        mixture, sources = batch
+
+        if self.use_cuda:
+            mixture = mixture.cuda(non_blocking=True)
+            sources = sources.cuda(non_blocking=True)
+
+        if not torch.is_complex(mixture):
+            # compute_stft=False: the batch holds raw waveforms. With
+            # compute_stft=True and compute_mask=False it already holds
+            # complex spectrograms and only the masks are deferred.
+            mixture = stft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, window=self.device_window, normalized=self.normalize, return_complex=True)
+            sources = stft(sources, n_fft=self.n_fft, hop_length=self.hop_length, window=self.device_window, normalized=self.normalize, return_complex=True)
+
+        ideal_mask, threshold_weight = compute_ideal_mask_and_threshold_weight(dataset.generate_mask, mixture, sources, threshold=dataset.threshold, eps=dataset.eps)
+
+        return mixture, sources, ideal_mask, threshold_weight
+
     def run(self):
         for epoch in range(self.start_epoch, self.epochs):
             start = time.time()
@@ -158,15 +219,12 @@ class AdhocTrainer(TrainerBase):
         """
         self.model.train()
 
-        train_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        train_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_train_batch = len(self.train_loader)
 
-        for idx, (mixture, sources, ideal_mask, threshold_weight) in enumerate(self.train_loader):
-            if self.use_cuda:
-                mixture = mixture.cuda()
-                sources = sources.cuda()
-                ideal_mask = ideal_mask.cuda()
-                threshold_weight = threshold_weight.cuda()
+        for idx, batch in enumerate(self.train_loader):
+            mixture, sources, ideal_mask, threshold_weight = self._prepare_batch(batch, self.train_loader.dataset)
 
             mixture_amplitude = torch.abs(mixture)
             if self.target_type == "source":
@@ -176,24 +234,30 @@ class AdhocTrainer(TrainerBase):
             else:
                 raise NotImplementedError("Not support `target_type={}.`".format(self.target_type))
 
-            estimated_sources_amplitude = self.model(mixture_amplitude, assignment=ideal_mask, threshold_weight=threshold_weight, n_sources=sources.size(1))
+            with torch.autocast('cuda', enabled=self.use_amp):
+                estimated_sources_amplitude = self.model(mixture_amplitude, assignment=ideal_mask, threshold_weight=threshold_weight, n_sources=self.n_sources)
+
+            if self.use_amp:
+                estimated_sources_amplitude = estimated_sources_amplitude.float() # Keep the loss in fp32.
 
             loss = self.criterion(estimated_sources_amplitude, target_amplitude)
 
-            self.optimizer.zero_grad()
-            loss.backward()
+            self.optimizer.zero_grad(set_to_none=True)
+            self.scaler.scale(loss).backward()
 
             if self.max_norm:
+                self.scaler.unscale_(self.optimizer)
                 nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
 
-            self.optimizer.step()
+            self.scaler.step(self.optimizer)
+            self.scaler.update()
 
-            train_loss += loss.item()
+            train_loss += loss.detach()
 
             if (idx + 1) % 100 == 0:
                 print("[Epoch {}/{}] iter {}/{} loss: {:.5f}".format(epoch + 1, self.epochs, idx + 1, n_train_batch, loss.item()), flush=True)
 
-        train_loss /= n_train_batch
+        train_loss = train_loss.item() / n_train_batch
 
         return train_loss
 
@@ -206,22 +270,19 @@ class AdhocTrainer(TrainerBase):
 
         self.model.eval()
 
-        valid_loss = 0
+        device = 'cuda' if self.use_cuda else 'cpu'
+        valid_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
         n_valid = len(self.valid_loader.dataset)
 
-        with torch.no_grad():
-            for idx, (mixture, sources, ideal_mask, threshold_weight) in enumerate(self.valid_loader):
+        with torch.inference_mode():
+            for idx, batch in enumerate(self.valid_loader):
                 """
                     mixture (batch_size, 1, n_bins, n_frames)
                     sources (batch_size, n_sources, n_bins, n_frames)
                     ideal_mask (batch_size, n_sources, n_bins, n_frames)
                     threshold_weight (batch_size, n_bins, n_frames)
                 """
-                if self.use_cuda:
-                    mixture = mixture.cuda()
-                    sources = sources.cuda()
-                    threshold_weight = threshold_weight.cuda()
-                    assignment = assignment.cuda()
+                mixture, sources, ideal_mask, threshold_weight = self._prepare_batch(batch, self.valid_loader.dataset)
 
                 mixture_amplitude = torch.abs(mixture)
                 if self.target_type == "source":
@@ -235,20 +296,26 @@ class AdhocTrainer(TrainerBase):
                 # At the test phase, assignment may be unknown.
                 loss, _ = pit(self.criterion, estimated_sources_amplitude, target_amplitude, batch_mean=False)
                 loss = loss.sum(dim=0)
-                valid_loss += loss.item()
+                valid_loss += loss.detach()
 
                 if idx < 5:
-                    mixture = mixture[0].cpu() # (1, n_bins, n_frames, 2)
-                    mixture_amplitude = mixture_amplitude[0].cpu() # (1, n_bins, n_frames)
-                    estimated_sources_amplitude = estimated_sources_amplitude[0].cpu() # (n_sources, n_bins, n_frames)
-
-                    phase = torch.angle(mixture)
-                    estimated_sources = estimated_sources_amplitude * torch.exp(1j * phase)
-                    estimated_sources = istft(estimated_sources, n_fft=self.n_fft, hop_length=self.hop_length, normalized=self.normalize, window=self.window) # (n_sources, T)
-                    estimated_sources = estimated_sources.cpu()
-
-                    mixture = istft(mixture, n_fft=self.n_fft, hop_length=self.hop_length, normalized=self.normalize, window=self.window) # (1, T)
-                    mixture = mixture.squeeze(dim=0) # (T,)
+                    mixture = mixture[0] # (1, n_bins, n_frames)
+                    mixture_amplitude = mixture_amplitude[0] # (1, n_bins, n_frames)
+                    estimated_sources_amplitude = estimated_sources_amplitude[0] # (n_sources, n_bins, n_frames)
+
+                    # Scaling the complex mixture by the amplitude ratio keeps its
+                    # phase in one broadcast multiply, without materializing
+                    # torch.angle and torch.exp intermediates.
+                    ratio = estimated_sources_amplitude / (mixture_amplitude + EPS)
+                    estimated_sources = mixture * ratio # (n_sources, n_bins, n_frames)
+
+                    # One iSTFT over the mixture and every estimate together, still
+                    # on the device; batch-size-1 iSTFT calls are too small to fill
+                    # it, and the single .cpu() afterwards consolidates the D2H
+                    # copies into one transfer.
+                    signals = torch.cat([mixture, estimated_sources], dim=0) # (1 + n_sources, n_bins, n_frames)
+                    signals = istft(signals, n_fft=self.n_fft, hop_length=self.hop_length, normalized=self.normalize, window=self.device_window).cpu() # (1 + n_sources, T)
+                    mixture, estimated_sources = signals[0], signals[1:] # (T,), (n_sources, T)
 
                     save_dir = os.path.join(self.sample_dir, "{}".format(idx + 1))
                     os.makedirs(save_dir, exist_ok=True)
@@ -265,7 +332,7 @@ class AdhocTrainer(TrainerBase):
                         signal = estimated_source.unsqueeze(dim=0) if estimated_source.dim() == 1 else estimated_source
                         torchaudio.save(save_path, signal, sample_rate=self.sample_rate, bits_per_sample=BITS_PER_SAMPLE_WSJ0)
 
-        valid_loss /= n_valid
+        valid_loss = valid_loss.item() / n_valid
 
         return valid_loss
 
@@ -644,7 +711,7 @@ class AdhocFinetuneTrainer(TrainerBase):
 
             loss = self.criterion(estimated_sources_amplitude, target_amplitude)
 
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
 
             if self.max_norm:
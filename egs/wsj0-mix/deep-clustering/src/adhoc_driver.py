@@ -172,7 +172,7 @@ class AdhocTrainer(TrainerBase):
             embedding = self.model(mixture_amplitude)
             loss = self.criterion(embedding, mask, binary_mask=threshold_weight)
 
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
 
             if self.add_noise:
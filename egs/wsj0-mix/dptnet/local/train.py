@@ -57,6 +57,7 @@ parser.add_argument('--loss_dir', type=str, default='./tmp/loss', help='Loss dir
 parser.add_argument('--sample_dir', type=str, default='./tmp/sample', help='Sample directory')
 parser.add_argument('--continue_from', type=str, default=None, help='Resume training')
 parser.add_argument('--use_cuda', type=int, default=1, help='0: Not use cuda, 1: Use cuda')
+parser.add_argument('--compile_model', type=int, default=0, help='0: Not compile model, 1: Compile model with torch.compile')
 parser.add_argument('--overwrite', type=int, default=0, help='0: NOT overwrite, 1: FORCE overwrite')
 parser.add_argument('--seed', type=int, default=42, help='Random seed')
 
@@ -93,6 +94,14 @@ def main(args):
     print(model)
     print("# Parameters: {}".format(model.num_parameters))
 
+    if args.compile_model:
+        # The separator forward is a long chain of small ops (segmentation,
+        # norm, transformer blocks, overlap-add); Inductor fuses the pointwise
+        # parts and cuts the per-call dispatch overhead.
+        # dynamic=True, since the validation utterances have variable length.
+        model = torch.compile(model, mode="reduce-overhead", fullgraph=False, dynamic=True)
+        print("Compile model with torch.compile", flush=True)
+
     if args.use_cuda:
         if torch.cuda.is_available():
             model.cuda()
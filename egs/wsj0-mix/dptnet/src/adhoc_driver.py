@@ -77,7 +77,7 @@ class AdhocTrainer(TrainerBase):
             estimated_sources = self.model(mixture)
             loss, _ = self.pit_criterion(estimated_sources, sources)
             
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             loss.backward()
             
             if self.max_norm:
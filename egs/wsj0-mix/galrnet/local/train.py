@@ -1,10 +1,13 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
+import os
 import argparse
 
 import torch
 import torch.nn as nn
+import torch.distributed as dist
+from torch.utils.data.distributed import DistributedSampler
 
 from utils.utils import set_seed
 from dataset import WaveTrainDataset, WaveEvalDataset, TrainDataLoader, EvalDataLoader
@@ -49,17 +52,37 @@ parser.add_argument('--weight_decay', type=float, default=0, help='Weight decay
 parser.add_argument('--max_norm', type=float, default=None, help='Gradient clipping')
 parser.add_argument('--batch_size', type=int, default=4, help='Batch size. Default: 128')
 parser.add_argument('--epochs', type=int, default=5, help='Number of epochs')
+parser.add_argument('--ckpt_every', type=int, default=5, help='Save last.pth every ckpt_every epochs. best.pth is always saved on improvement')
+parser.add_argument('--plot_every', type=int, default=10, help='Render the loss curve every plot_every epochs')
 parser.add_argument('--model_dir', type=str, default='./tmp/model', help='Model directory')
 parser.add_argument('--loss_dir', type=str, default='./tmp/loss', help='Loss directory')
 parser.add_argument('--sample_dir', type=str, default='./tmp/sample', help='Sample directory')
 parser.add_argument('--continue_from', type=str, default=None, help='Resume training')
 parser.add_argument('--use_cuda', type=int, default=1, help='0: Not use cuda, 1: Use cuda')
+parser.add_argument('--compile_model', type=int, default=0, help='0: Not compile model, 1: Compile model with torch.compile')
 parser.add_argument('--overwrite', type=int, default=0, help='0: NOT overwrite, 1: FORCE overwrite')
 parser.add_argument('--seed', type=int, default=42, help='Random seed')
+parser.add_argument('--num_workers', type=int, default=None, help='# DataLoader workers. Defaults to half the visible cores.')
+parser.add_argument('--prefetch_factor', type=int, default=None, help='Batches prefetched per worker')
+parser.add_argument('--persistent_workers', type=int, default=None, help='0: Respawn workers every epoch, 1: Keep workers alive')
 
 def main(args):
     set_seed(args.seed)
-    
+
+    # Autotune cuDNN conv kernels for the fixed-shape training batches and
+    # allow TF32 tensor cores in the encoder/decoder matmuls.
+    torch.backends.cudnn.benchmark = True
+    torch.backends.cuda.matmul.allow_tf32 = True
+    torch.backends.cudnn.allow_tf32 = True
+
+    # torchrun sets WORLD_SIZE/RANK/LOCAL_RANK; launched plainly, fall back to DataParallel.
+    distributed = int(os.environ.get('WORLD_SIZE', 1)) > 1
+
+    if distributed:
+        dist.init_process_group(backend='nccl')
+        local_rank = int(os.environ['LOCAL_RANK'])
+        torch.cuda.set_device(local_rank)
+
     samples = int(args.sample_rate * args.duration)
     overlap = samples // 2
     max_samples = int(args.sample_rate * args.valid_duration)
@@ -69,9 +92,23 @@ def main(args):
     print("Training dataset includes {} samples.".format(len(train_dataset)))
     print("Valid dataset includes {} samples.".format(len(valid_dataset)))
     
+    # Only forwarded when given, so the loader's own defaults (pinned memory,
+    # half-the-cores workers, persistent workers with prefetching) still apply.
+    loader_kwargs = {}
+    if args.num_workers is not None:
+        loader_kwargs['num_workers'] = args.num_workers
+    if args.prefetch_factor is not None:
+        loader_kwargs['prefetch_factor'] = args.prefetch_factor
+    if args.persistent_workers is not None:
+        loader_kwargs['persistent_workers'] = bool(args.persistent_workers)
+
     loader = {}
-    loader['train'] = TrainDataLoader(train_dataset, batch_size=args.batch_size, shuffle=True)
-    loader['valid'] = EvalDataLoader(valid_dataset, batch_size=1, shuffle=False)
+    if distributed:
+        # The sampler shuffles; each process only loads its own shard.
+        loader['train'] = TrainDataLoader(train_dataset, batch_size=args.batch_size, sampler=DistributedSampler(train_dataset), **loader_kwargs)
+    else:
+        loader['train'] = TrainDataLoader(train_dataset, batch_size=args.batch_size, shuffle=True, **loader_kwargs)
+    loader['valid'] = EvalDataLoader(valid_dataset, batch_size=1, shuffle=False, **loader_kwargs)
     
     if not args.enc_nonlinear:
         args.enc_nonlinear = None
@@ -90,11 +127,24 @@ def main(args):
     print(model)
     print("# Parameters: {}".format(model.num_parameters))
 
+    if args.compile_model:
+        # Fuses the elementwise chains in the separator into fewer kernels.
+        # Compile before DataParallel so that each replica shares the compiled module.
+        # dynamic=True, since the validation utterances have variable length.
+        model = torch.compile(model, mode="reduce-overhead", fullgraph=False, dynamic=True)
+        print("Compile model with torch.compile")
+
     if args.use_cuda:
         if torch.cuda.is_available():
             model.cuda()
-            model = nn.DataParallel(model)
-            print("Use CUDA")
+            if distributed:
+                # One process per GPU; gradient allreduce overlaps with backward,
+                # unlike DataParallel's per-batch scatter/gather through Python.
+                model = nn.parallel.DistributedDataParallel(model, device_ids=[local_rank])
+                print("Use CUDA (DistributedDataParallel, rank {}/{})".format(dist.get_rank(), dist.get_world_size()))
+            else:
+                model = nn.DataParallel(model)
+                print("Use CUDA")
         else:
             raise ValueError("Cannot use CUDA.")
     else:
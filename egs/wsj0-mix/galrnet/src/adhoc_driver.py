@@ -1,15 +1,24 @@
 import os
 import time
 
+from torch.utils.data.distributed import DistributedSampler
+
 from utils.utils import draw_loss_curve
 from driver import TrainerBase, TesterBase
 
 class AdhocTrainer(TrainerBase):
     def __init__(self, model, loader, pit_criterion, optimizer, args):
         super().__init__(model, loader, pit_criterion, optimizer, args)
-    
+
     def run(self):
+        sampler = getattr(self.train_loader, 'sampler', None)
+
         for epoch in range(self.start_epoch, self.epochs):
+            if isinstance(sampler, DistributedSampler):
+                # Reseed the per-rank shuffle; left alone, every epoch replays
+                # the same batch order.
+                sampler.set_epoch(epoch)
+
             start = time.time()
             train_loss, valid_loss = self.run_one_epoch(epoch)
             end = time.time()
@@ -26,11 +35,14 @@ class AdhocTrainer(TrainerBase):
                     print("Learning rate: {} -> {}".format(prev_lr, lr))
                     param_group['lr'] = lr
             
-            if valid_loss < self.best_loss:
+            is_best = valid_loss < self.best_loss
+
+            if is_best:
                 self.best_loss = valid_loss
                 self.no_improvement = 0
-                model_path = os.path.join(self.model_dir, "best.pth")
-                self.save_model(epoch, model_path)
+                if self.is_main_process:
+                    model_path = os.path.join(self.model_dir, "best.pth")
+                    self.save_model(epoch, model_path)
             else:
                 if valid_loss >= self.prev_loss:
                     self.no_improvement += 1
@@ -39,16 +51,24 @@ class AdhocTrainer(TrainerBase):
             
             self.prev_loss = valid_loss
             
-            model_path = os.path.join(self.model_dir, "last.pth")
-            self.save_model(epoch, model_path)
-            
-            save_path = os.path.join(self.loss_dir, "loss.png")
-            draw_loss_curve(train_loss=self.train_loss[:epoch + 1], valid_loss=self.valid_loss[:epoch + 1], save_path=save_path)
+            if self.is_main_process:
+                if (epoch + 1) % self.ckpt_every == 0 or epoch + 1 == self.epochs:
+                    model_path = os.path.join(self.model_dir, "last.pth")
+                    self.save_model(epoch, model_path)
+
+                if (epoch + 1) % self.plot_every == 0 or is_best:
+                    save_path = os.path.join(self.loss_dir, "loss.png")
+                    # Cloned slices, so matplotlib renders on the I/O pool while
+                    # the next epoch overwrites the loss buffers.
+                    self._io_pool.submit(draw_loss_curve, train_loss=self.train_loss[:epoch + 1].clone(), valid_loss=self.valid_loss[:epoch + 1].clone(), save_path=save_path)
 
             if self.no_improvement >= 10:
                 print("Stop training")
                 break
 
+        if self._save_future is not None:
+            self._save_future.result()
+
 class Tester(TesterBase):
     def __init__(self, model, loader, pit_criterion, args):
         super().__init__(self, model, loader, pit_criterion, args)
\ No newline at end of file
@@ -7,10 +7,12 @@ import uuid
 import torch
 import torchaudio
 import torch.nn as nn
+import torch.distributed as dist
+from torch.utils.data.distributed import DistributedSampler
 
 from utils.utils import draw_loss_curve
 from utils.bss import bss_eval_sources
-from driver import TrainerBase, TesterBase
+from driver import CudaPrefetcher, TrainerBase, TesterBase
 from criterion.pit import pit
 
 BITS_PER_SAMPLE_WSJ0 = 16
@@ -37,14 +39,29 @@ class ORPITTrainer(TrainerBase):
         self.train_loss = torch.empty(self.epochs)
         
         self.use_cuda = args.use_cuda
-        
+
+        # Under torchrun, only rank 0 saves checkpoints and sample WAVs;
+        # single-process runs are always the main process.
+        self.is_main_process = not (dist.is_available() and dist.is_initialized()) or dist.get_rank() == 0
+
+        # Render the loss curve every `plot_every` epochs only.
+        if hasattr(args, 'plot_every'):
+            self.plot_every = args.plot_every
+        else:
+            self.plot_every = 10
+
+        if self.use_cuda and torch.cuda.is_available():
+            # Stage the next batch's H2D copy on a side stream while the
+            # current step computes.
+            self.train_loader = CudaPrefetcher(self.train_loader)
+
         if args.continue_from:
             config = torch.load(args.continue_from, map_location=lambda storage, loc: storage)
 
             self.start_epoch = config['epoch']
             self.train_loss[:self.start_epoch] = config['train_loss'][:self.start_epoch]
             
-            if isinstance(self.model, nn.DataParallel):
+            if isinstance(self.model, (nn.DataParallel, nn.parallel.DistributedDataParallel)):
                 self.model.module.load_state_dict(config['state_dict'])
             else:
                 self.model.load_state_dict(config['state_dict'])
@@ -63,7 +80,14 @@ class ORPITTrainer(TrainerBase):
             self.start_epoch = 0
     
     def run(self):
+        sampler = getattr(self.train_loader, 'sampler', None)
+
         for epoch in range(self.start_epoch, self.epochs):
+            if isinstance(sampler, DistributedSampler):
+                # Reseed the per-rank shuffle; left alone, every epoch replays
+                # the same batch order.
+                sampler.set_epoch(epoch)
+
             start = time.time()
             train_loss = self.run_one_epoch(epoch)
             end = time.time()
@@ -72,11 +96,13 @@ class ORPITTrainer(TrainerBase):
             
             self.train_loss[epoch] = train_loss
             
-            model_path = os.path.join(self.model_dir, "last.pth")
-            self.save_model(epoch, model_path)
-            
-            save_path = os.path.join(self.loss_dir, "loss.png")
-            draw_loss_curve(train_loss=self.train_loss[:epoch + 1], save_path=save_path)
+            if self.is_main_process:
+                model_path = os.path.join(self.model_dir, "last.pth")
+                self.save_model(epoch, model_path)
+
+                if (epoch + 1) % self.plot_every == 0 or epoch + 1 == self.epochs:
+                    save_path = os.path.join(self.loss_dir, "loss.png")
+                    draw_loss_curve(train_loss=self.train_loss[:epoch + 1], save_path=save_path)
     
     def run_one_epoch(self, epoch):
         """
@@ -86,7 +112,44 @@ class ORPITTrainer(TrainerBase):
         _ = self.run_one_epoch_eval(epoch)
 
         return train_loss
-    
+
+    def run_one_epoch_train(self, epoch):
+        """
+        Training
+        """
+        self.model.train()
+
+        device = 'cuda' if self.use_cuda else 'cpu'
+        train_loss = torch.zeros((), device=device) # Accumulated on device; .item() would force a GPU sync every batch.
+        n_train_batch = len(self.train_loader)
+
+        for idx, (mixture, sources, n_sources) in enumerate(self.train_loader):
+            if self.use_cuda:
+                mixture = mixture.cuda(non_blocking=True)
+                sources = sources.cuda(non_blocking=True)
+
+            n_sources = n_sources.tolist()
+
+            estimated_sources = self.model(mixture)
+            loss, _ = self.pit_criterion(estimated_sources, sources, n_sources=n_sources)
+
+            self.optimizer.zero_grad(set_to_none=True)
+            loss.backward()
+
+            if self.max_norm:
+                nn.utils.clip_grad_norm_(self.model.parameters(), self.max_norm)
+
+            self.optimizer.step()
+
+            train_loss += loss.detach()
+
+            if (idx + 1) % 100 == 0:
+                print("[Epoch {}/{}] iter {}/{} loss: {:.5f}".format(epoch + 1, self.epochs, idx + 1, n_train_batch, loss.item()), flush=True)
+
+        train_loss = train_loss.item() / n_train_batch
+
+        return train_loss
+
     def run_one_epoch_eval(self, epoch):
         """
         Validation
@@ -96,31 +159,35 @@ class ORPITTrainer(TrainerBase):
         n_sources_count = {}
         
         with torch.no_grad():
-            for idx, (mixture, sources, segment_IDs) in enumerate(self.valid_loader):
+            for idx, (mixture, sources, n_sources, segment_IDs) in enumerate(self.valid_loader):
                 if self.use_cuda:
+                    # `sources` stays on CPU. This loop only dumps estimated
+                    # sources, so transferring the references wastes bandwidth.
                     mixture = mixture.cuda()
-                    sources = sources.cuda()
-                
-                sources, n_sources = nn.utils.rnn.pad_packed_sequence(sources, batch_first=True)
+
                 n_sources = n_sources.tolist()
-                
+
                 output_one_and_rest = self.model(mixture)
                 output_one, output_rest = torch.split(output_one_and_rest, [1, 1], dim=1)
-                output = []
-                output.append(output_one)
+                batch_size, _, T = output_one_and_rest.size()
+                # Preallocate the estimate buffer and copy each extracted source
+                # in place. Splitting returns views, so appending them to a list
+                # would keep every (batch_size, 2, T) forward output alive until
+                # a final torch.cat.
+                output = torch.empty(batch_size, n_sources[0], T, dtype=output_one_and_rest.dtype, device=output_one_and_rest.device)
+                output[:, 0:1] = output_one
 
                 for source_idx in range(1, n_sources[0] - 1):
                     output_one_and_rest = self.model(output_rest)
                     output_one, output_rest = torch.split(output_one_and_rest, [1, 1], dim=1)
-                    output.append(output_one)
-                
-                output.append(output_rest)
-                output = torch.cat(output, dim=1)
+                    output[:, source_idx:source_idx + 1] = output_one
+
+                output[:, -1:] = output_rest
 
                 if not n_sources[0] in n_sources_count.keys():
                     n_sources_count[n_sources[0]] = 0
                 
-                if n_sources_count[n_sources[0]] < 5:
+                if self.is_main_process and n_sources_count[n_sources[0]] < 5:
                     mixture = mixture[0].squeeze(dim=0).detach().cpu()
                     estimated_sources = output[0].detach().cpu()
                     
@@ -144,7 +211,7 @@ class ORPITTrainer(TrainerBase):
         return -1
      
     def save_model(self, epoch, model_path='./tmp.pth'):
-        if isinstance(self.model, nn.DataParallel):
+        if isinstance(self.model, (nn.DataParallel, nn.parallel.DistributedDataParallel)):
             config = self.model.module.get_config()
             config['state_dict'] = self.model.module.state_dict()
         else:
@@ -361,7 +428,7 @@ class FinetuneTrainer(TrainerBase):
 
             self.best_loss = float('infinity')
         
-        if isinstance(self.model, nn.DataParallel):
+        if isinstance(self.model, (nn.DataParallel, nn.parallel.DistributedDataParallel)):
             self.model.module.load_state_dict(config['state_dict'])
         else:
             self.model.load_state_dict(config['state_dict'])
@@ -419,7 +486,7 @@ class FinetuneTrainer(TrainerBase):
                     possible_indices = list(range(n_sources - stage_idx))
                     idx_one = indices[batch_idx].item()
                     del possible_indices[idx_one]
-                    possible_indices = torch.Tensor(possible_indices).long()
+                    possible_indices = torch.tensor(possible_indices, dtype=torch.long)
                     possible_indices = possible_indices.to(sources[batch_idx].device)
                     
                     _sources_rest = torch.index_select(sources[batch_idx], dim=0, index=possible_indices)
@@ -428,7 +495,7 @@ class FinetuneTrainer(TrainerBase):
                 _, mixture = torch.split(estimated_sources, [1, 1], dim=1)
                 sources = torch.cat(sources_rest, dim=0)
             
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             accumlated_loss.backward()
             
             if self.max_norm:
@@ -501,7 +568,7 @@ class FinetuneTrainer(TrainerBase):
         return valid_loss
     
     def save_model(self, epoch, model_path='./tmp.pth'):
-        if isinstance(self.model, nn.DataParallel):
+        if isinstance(self.model, (nn.DataParallel, nn.parallel.DistributedDataParallel)):
             config = self.model.module.get_config()
             config['state_dict'] = self.model.module.state_dict()
         else:
@@ -3,7 +3,7 @@ import os
 import torch
 import torchaudio
 
-from dataset import WaveDataset
+from dataset import WSJ0Dataset, WaveDataset, read_wav_info, _prefetch_wav_info
 
 class WaveTrainDataset(WaveDataset):
     def __init__(self, wav_root, list_path, samples=32000, overlap=None, n_sources=2, spk_to_idx=None):
@@ -26,7 +26,9 @@ class WaveTrainDataset(WaveDataset):
 
 class WaveEvalDataset(WaveDataset):
     def __init__(self, wav_root, list_path, max_samples=None, n_sources=2, spk_to_idx=None):
-        super().__init__(wav_root, list_path, n_sources=n_sources)
+        # Skip WaveDataset.__init__: it would scan and segment every WAV with
+        # training defaults, only for the index to be rebuilt below.
+        WSJ0Dataset.__init__(self, wav_root, list_path)
 
         self.spk_to_idx = spk_to_idx
 
@@ -35,14 +37,14 @@ class WaveEvalDataset(WaveDataset):
 
         self.json_data = []
         
+        _prefetch_wav_info(wav_root, list_path)
+        
         with open(list_path) as f:
             for line in f:
                 ID = line.strip()
                 wav_path = os.path.join(wav_root, 'mix', '{}.wav'.format(ID))
 
-                wave, _ = torchaudio.load(wav_path)
-                
-                _, T_total = wave.size()
+                T_total, _ = read_wav_info(wav_path)
                 
                 if max_samples is None:
                     samples = T_total
@@ -75,9 +77,11 @@ class WaveEvalDataset(WaveDataset):
             
                 self.json_data.append(data)
     
+        self._finalize_index()
+
     def __getitem__(self, idx):
         mixture, sources, _ = super().__getitem__(idx)
-        segment_ID = self.json_data[idx]['ID']
+        segment_ID = self.ids[idx]
 
         spk = segment_ID.split('_')[0:-1:2]
         spk_idx = []
@@ -140,12 +140,12 @@ class Trainer:
                 sources = sources.cuda()
                 spk_idx = spk_idx.cuda()
             
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
 
             with torch.no_grad():
                 sorted_idx = self.model(mixture, spk_idx=spk_idx)
             
-            self.optimizer.zero_grad()
+            self.optimizer.zero_grad(set_to_none=True)
             estimated_sources, spk_vector, spk_embedding, all_spk_embedding = self.model(mixture, spk_idx=spk_idx, sorted_idx=sorted_idx, return_all_layers=self.return_all_layers, return_spk_vector=True, return_spk_embedding=True, return_all_spk_embedding=True)
             
             if self.return_all_layers:
@@ -134,7 +134,7 @@ class WaveSplit(WaveSplitBase):
         assert feature_last, "feature_last should be True."
 
         patterns = list(itertools.permutations(range(self.n_sources)))
-        patterns = torch.Tensor(patterns).long()
+        patterns = torch.tensor(patterns, dtype=torch.long)
         
         P = len(patterns)
         possible_loss = []
@@ -19,7 +19,8 @@ def compute_ideal_binary_mask(input, source_dim=-3):
         mask <torch.Tensor>: Nonnegative tensor.
     """
     if torch.is_complex(input):
-        input = torch.abs(input)
+        # argmax is invariant under squaring, so compare powers and skip the sqrt inside complex abs.
+        input = torch.view_as_real(input).pow(2).sum(dim=-1)
 
     n_dims = input.dim()
 
@@ -71,10 +72,14 @@ def compute_wiener_filter_mask(input, source_dim=None, domain=1, eps=EPS):
         mask <torch.Tensor>: Nonnegative tensor with shape of (n_sources, n_bins, n_frames) or (batch_size, n_sources, n_bins, n_frames)
     """
     if torch.is_complex(input):
-        input = torch.abs(input)
-
-    n_dims = input.dim()
-    power = input**(2 / domain) # (n_sources, n_bins, n_frames) or (batch_size, n_sources, n_bins, n_frames)
+        # Compute |S|^2 directly from real/imag parts; avoids the sqrt of abs followed by squaring.
+        power = torch.view_as_real(input).pow(2).sum(dim=-1)
+        if domain != 1:
+            power = power**(1 / domain)
+        n_dims = power.dim()
+    else:
+        n_dims = input.dim()
+        power = input**(2 / domain) # (n_sources, n_bins, n_frames) or (batch_size, n_sources, n_bins, n_frames)
 
     if n_dims == 3:
         source_dim = 0 if source_dim is None else source_dim
@@ -3,9 +3,52 @@ import itertools
 import torch
 import torch.nn as nn
 
+from criterion.sdr import SDR, NegSDR, SISDR, NegSISDR, ClippedSISDR, ClippedNegSISDR
+
 """
     Permutation invariant training
 """
+
+# Criteria that evaluate each source independently and reduce over every
+# non-batch dimension; for these, the n_sources! permutations can be scored
+# from one (n_sources x n_sources) pairwise loss matrix.
+_pairwise_criteria = (SDR, NegSDR, SISDR, NegSISDR, ClippedSISDR, ClippedNegSISDR)
+
+def _possible_loss_pairwise(criterion, input, target, patterns):
+    """
+    Score all permutations from a pairwise loss matrix.
+    The criterion is evaluated once on n_sources**2 merged pairs instead of
+    n_sources! times on full batches.
+    Args:
+        criterion <callable>
+        input (batch_size, n_sources, *)
+        target (batch_size, n_sources, *)
+        patterns (P, n_sources) <torch.LongTensor>
+    Returns:
+        possible_loss (batch_size, P)
+    """
+    batch_size, n_sources = input.size(0), input.size(1)
+    feature_size = input.size()[2:]
+
+    expanded_input = input.unsqueeze(dim=2).expand(batch_size, n_sources, n_sources, *feature_size)
+    expanded_target = target.unsqueeze(dim=1).expand(batch_size, n_sources, n_sources, *feature_size)
+    expanded_input = expanded_input.reshape(batch_size * n_sources * n_sources, *feature_size)
+    expanded_target = expanded_target.reshape(batch_size * n_sources * n_sources, *feature_size)
+
+    pairwise_loss = criterion(expanded_input, expanded_target, batch_mean=False) # (batch_size * n_sources * n_sources,)
+    pairwise_loss = pairwise_loss.view(batch_size, n_sources, n_sources)
+
+    patterns = patterns.to(pairwise_loss.device)
+    indices = patterns.transpose(0, 1).unsqueeze(dim=0).expand(batch_size, -1, -1) # (batch_size, n_sources, P)
+    possible_loss = torch.gather(pairwise_loss, 2, indices) # (batch_size, n_sources, P)
+
+    if criterion.reduction == 'mean':
+        possible_loss = possible_loss.mean(dim=1)
+    else:
+        possible_loss = possible_loss.sum(dim=1)
+
+    return possible_loss
+
 def pit(criterion, input, target, n_sources=None, patterns=None, batch_mean=True):
     """
     Args:
@@ -23,14 +66,18 @@ def pit(criterion, input, target, n_sources=None, patterns=None, batch_mean=True
         patterns = torch.Tensor(patterns).long()
 
     P = len(patterns)
-    possible_loss = []
 
-    for idx in range(P):
-        pattern = patterns[idx]
-        loss = criterion(input, target[:, pattern], batch_mean=False)
-        possible_loss.append(loss)
+    if isinstance(criterion, _pairwise_criteria) and criterion.reduction in ['mean', 'sum']:
+        possible_loss = _possible_loss_pairwise(criterion, input, target, patterns) # (batch_size, P)
+    else:
+        possible_loss = []
+
+        for idx in range(P):
+            pattern = patterns[idx]
+            loss = criterion(input, target[:, pattern], batch_mean=False)
+            possible_loss.append(loss)
 
-    possible_loss = torch.stack(possible_loss, dim=1)
+        possible_loss = torch.stack(possible_loss, dim=1)
 
     # possible_loss (batch_size, P)
     if hasattr(criterion, "maximize") and criterion.maximize:
@@ -95,11 +142,11 @@ class ORPIT(nn.Module):
         patterns = list(itertools.permutations(range(2))) # 2 means 'one' and 'rest'
         self.patterns = torch.Tensor(patterns).long()
 
-    def forward(self, input, target, batch_mean=True):
+    def forward(self, input, target, n_sources=None, batch_mean=True):
         """
         Args:
             input (batch_size, 2, *)
-            target <packed_sequence>: `n_sources` is different for every input.
+            target <packed_sequence> or <torch.Tensor>: `n_sources` is different for every input.
             n_sources (batch_size,): The number of sources per input. If `None`, the number is regarded same among the batch.
         Returns:
             loss (batch_size,): minimum loss for each data
@@ -111,7 +158,15 @@ class ORPIT(nn.Module):
 
         if type(target) is torch.Tensor:
             batch_size = target.size(0)
-            lens_unpacked = [target.size(1)] * batch_size
+
+            if n_sources is None:
+                lens_unpacked = [target.size(1)] * batch_size
+            else:
+                # Zero-padded rows beyond each sample's length must not be
+                # scored as real sources.
+                if type(n_sources) is torch.Tensor:
+                    n_sources = n_sources.tolist()
+                lens_unpacked = list(n_sources)
         else:
             target, lens_unpacked = nn.utils.rnn.pad_packed_sequence(target, batch_first=True)
 
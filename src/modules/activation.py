@@ -11,8 +11,16 @@ class ConcatenatedReLU(nn.Module):
         self.dim = dim
 
     def forward(self, input):
-        positive, negative = F.relu(input), F.relu(-input)
-        output = torch.cat([positive, negative], dim=self.dim)
+        dim = self.dim
+        num_features = input.size(dim)
+        sizes = list(input.size())
+        sizes[dim] = 2 * num_features
+
+        # Clamp both halves of one preallocated output in place instead of
+        # materializing relu(input) and relu(-input) and concatenating them.
+        output = torch.empty(sizes, dtype=input.dtype, device=input.device)
+        output.narrow(dim, 0, num_features).copy_(input).clamp_(min=0)
+        output.narrow(dim, num_features, num_features).copy_(input).neg_().clamp_(min=0)
 
         return output
 
@@ -47,10 +55,11 @@ class ModReLU1d(nn.Module):
         if not is_complex:
             input = torch.view_as_complex(input)
 
+        # Scaling the input by relu(|z| + b) / |z| keeps its phase without
+        # materializing torch.angle and torch.exp intermediates.
         magnitude = torch.abs(input)
-        angle = torch.angle(input)
-        magnitude = F.relu(magnitude + self.bias.unsqueeze(dim=-1))
-        output = magnitude * torch.exp(1j * angle)
+        scale = F.relu(magnitude + self.bias.unsqueeze(dim=-1)) / (magnitude + EPS)
+        output = input * scale
 
         if not is_complex:
             output = torch.view_as_real(output)
@@ -85,10 +94,11 @@ class ModReLU2d(nn.Module):
         if not is_complex:
             input = torch.view_as_complex(input)
 
+        # Scaling the input by relu(|z| + b) / |z| keeps its phase without
+        # materializing torch.angle and torch.exp intermediates.
         magnitude = torch.abs(input)
-        angle = torch.angle(input)
-        magnitude = F.relu(magnitude + self.bias.unsqueeze(dim=-1).unsqueeze(dim=-1))
-        output = magnitude * torch.exp(1j * angle)
+        scale = F.relu(magnitude + self.bias.unsqueeze(dim=-1).unsqueeze(dim=-1)) / (magnitude + EPS)
+        output = input * scale
 
         if not is_complex:
             output = torch.view_as_real(output)
@@ -150,9 +160,11 @@ class ZReLU(nn.Module):
 
         real, imag = input.real, input.imag
 
-        condition = torch.logical_and(real > 0, imag > 0)
-        real = torch.where(condition, real, torch.zeros_like(real))
-        imag = torch.where(condition, imag, torch.zeros_like(imag))
+        # Multiplying by the mask zeroes the rejected quadrants without the
+        # zeros_like allocations and select kernels torch.where needs.
+        mask = torch.logical_and(real > 0, imag > 0).to(real.dtype)
+        real = real * mask
+        imag = imag * mask
 
         output = torch.complex(real, imag)
 
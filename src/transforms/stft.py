@@ -15,7 +15,7 @@ def stft(input, n_fft, hop_length=None, win_length=None, window=None, center=Tru
         input = input.unsqueeze(dim=0)
     elif n_dims > 2:
         channels = input.size()[:-1]
-        input = input.view(-1, input.size(-1))
+        input = input.reshape(-1, input.size(-1)) # reshape returns a view when strides allow, so no copy for contiguous input
 
     output = torch.stft(
         input,
@@ -28,12 +28,12 @@ def stft(input, n_fft, hop_length=None, win_length=None, window=None, center=Tru
         if n_dims == 1:
             output = output.squeeze(dim=0)
         elif n_dims > 2:
-            output = output.view(*channels, *output.size()[-2:])
+            output = output.reshape(*channels, *output.size()[-2:])
     else:
         if n_dims == 1:
             output = output.squeeze(dim=0)
         elif n_dims > 2:
-            output = output.view(*channels, *output.size()[-3:])
+            output = output.reshape(*channels, *output.size()[-3:])
 
     return output
 
@@ -54,7 +54,7 @@ def istft(input, n_fft, hop_length=None, win_length=None, window=None, center=Tr
         input = input.unsqueeze(dim=0)
     elif n_dims > 3:
         channels = input.size()[:-2]
-        input = input.view(-1, *input.size()[-2:])
+        input = input.reshape(-1, *input.size()[-2:])
 
     output = torch.istft(
         input,
@@ -66,7 +66,7 @@ def istft(input, n_fft, hop_length=None, win_length=None, window=None, center=Tr
     if n_dims == 2:
         output = output.squeeze(dim=0)
     elif n_dims > 3:
-        output = output.view(*channels, -1)
+        output = output.reshape(*channels, -1)
 
     return output
 
@@ -1,4 +1,5 @@
 import subprocess
+from functools import lru_cache
 
 import numpy as np
 import torch
@@ -23,6 +24,17 @@ def build_window(n_fft, window_fn='hann', **kwargs):
 
     return window
 
+@lru_cache(maxsize=32)
+def cached_window(n_fft, window_fn='hann', device='cpu', **kwargs):
+    """
+    Memoized `build_window`. Windows are small but otherwise rebuilt per dataset
+    (and per DataLoader worker); caching keeps a single tensor per
+    (n_fft, window_fn, device) combination.
+    """
+    window = build_window(n_fft, window_fn=window_fn, **kwargs)
+
+    return window.to(torch.device(device))
+
 def build_optimal_window(window, hop_length=None):
     """
     Args: